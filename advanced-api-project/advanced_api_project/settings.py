@@ -43,6 +43,11 @@ INSTALLED_APPS = [
 ]
 
 REST_FRAMEWORK = {
+    # orjson-backed JSON rendering (falls back to the stock encoder without orjson)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -0,0 +1,105 @@
+"""
+JSON renderers for large responses.
+
+ORJSONRenderer:
+- Drop-in replacement for DRF's JSONRenderer that encodes with orjson.
+- Falls back to JSONRenderer when orjson is not installed, for data orjson
+  rejects (integers beyond 64 bits) and for non-finite floats, which orjson
+  would write as null where JSONRenderer raises.
+- Dates and times go through DRF's encoder, so they are formatted the same
+  (``Z`` for UTC).
+
+StreamingJSONResponse:
+- Streams a JSON array built item by item from a queryset iterator, so
+  exports run in bounded memory and the first bytes go out right away.
+"""
+
+import math
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+def _has_non_finite_float(data):
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renders with orjson when it is available; same output as JSONRenderer otherwise.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        # Like json.dumps, turn int, float and other non-str dict keys into
+        # strings, and leave dates and times to the DRF encoder.
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.get_indent(accepted_media_type, renderer_context):
+            option |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=option)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson writes NaN and infinity as null. Only a null in the output can
+        # be one, so the data is searched only then; JSONRenderer raises for them.
+        if self.strict and b'null' in ret and _has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, escape the two line terminators that are valid JSON but not valid JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+_renderer = ORJSONRenderer()
+
+
+def dumps(data):
+    """
+    Encode one item the way ORJSONRenderer would.
+    """
+    return _renderer.render(data)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    Streams ``queryset`` as a JSON array, serializing each object with
+    ``serializer_class``. Rows are fetched with ``.iterator(chunk_size)`` and
+    written out one chunk at a time.
+    """
+
+    def __init__(self, queryset, serializer_class, chunk_size=500, context=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(self.iter_chunks(queryset, serializer_class, chunk_size, context or {}), **kwargs)
+
+    @staticmethod
+    def iter_chunks(queryset, serializer_class, chunk_size, context):
+        yield b'['
+        chunk = []
+        first = True
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(dumps(serializer_class(obj, context=context).data))
+            if len(chunk) >= chunk_size:
+                yield (b'' if first else b',') + b','.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b'' if first else b',') + b','.join(chunk)
+        yield b']'
@@ -6,14 +6,27 @@ BookSerializer:
 AuthorSerializer:
 - Serializes author's name.
 - Includes nested BookSerializer for all related books.
+
+Both accept a `fields` argument to render only some of their fields, and
+AuthorSerializer a `book_fields` argument for the nested books.
 """
 
 from rest_framework import serializers
 from datetime import datetime
 from .models import Author, Book
 
+# Lets callers pick a subset of fields: Serializer(obj, fields=['name'])
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 # Serializes Book model with all fields
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = '__all__'
@@ -27,10 +40,16 @@ class BookSerializer(serializers.ModelSerializer):
 
 
 # Serializes Author model with nested books
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     books = BookSerializer(many=True, read_only=True)  
     # 'books' is from the related_name in Book model
 
     class Meta:
         model = Author
         fields = ['name', 'books']
+
+    def __init__(self, *args, **kwargs):
+        book_fields = kwargs.pop('book_fields', None)
+        super().__init__(*args, **kwargs)
+        if book_fields is not None and 'books' in self.fields:
+            self.fields['books'] = BookSerializer(many=True, read_only=True, fields=book_fields)
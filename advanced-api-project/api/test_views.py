@@ -1,8 +1,14 @@
+import datetime
+import json
+
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
 from .models import Author, Book
+from .renderers import ORJSONRenderer, StreamingJSONResponse
+from .serializers import AuthorSerializer
 
 
 class BookAPITestCase(APITestCase):
@@ -119,3 +125,84 @@ class BookAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         years = [book["publication_year"] for book in response.data]
         self.assertEqual(years, sorted(years, reverse=True))
+
+
+class AuthorExportTestCase(APITestCase):
+    """Tests for the streamed author export and the orjson renderer."""
+
+    def setUp(self):
+        for i in range(3):
+            author = Author.objects.create(name=f"Author {i}")
+            Book.objects.create(title=f"Book {i}", publication_year=2000 + i, author=author)
+
+    def test_export_streams_all_authors(self):
+        response = self.client.get(reverse("author-export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([author["name"] for author in data], ["Author 0", "Author 1", "Author 2"])
+        self.assertEqual(data[1]["books"][0]["title"], "Book 1")
+
+    def test_export_chunks_are_valid_json(self):
+        chunks = StreamingJSONResponse.iter_chunks(
+            Author.objects.order_by("pk").prefetch_related("books"), AuthorSerializer, 2, {}
+        )
+        self.assertEqual(len(json.loads(b"".join(chunks))), 3)
+        self.assertEqual(b"".join(StreamingJSONResponse.iter_chunks(Author.objects.none(), AuthorSerializer, 2, {})), b"[]")
+
+    def test_renderer_matches_json_renderer(self):
+        data = {"title": "Caf\u00e9 \u2028", "year": 2020, "tags": ["a", "b"]}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertNotIn(b"\xe2\x80\xa8", ORJSONRenderer().render(data))
+
+    def test_renderer_formats_datetimes_like_json_renderer(self):
+        moment = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        data = {"at": moment, "on": moment.date(), "time": moment.time().replace(tzinfo=None)}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(json.loads(ORJSONRenderer().render(data))["at"], "2024-05-01T12:30:15.123456Z")
+
+    def test_renderer_rejects_non_finite_floats(self):
+        for value in (float("nan"), float("inf")):
+            with self.assertRaisesMessage(ValueError, "Out of range float values are not JSON compliant"):
+                ORJSONRenderer().render({"results": [{"score": value, "note": None}]})
+        self.assertEqual(json.loads(ORJSONRenderer().render({"score": 1.5, "note": None})), {"score": 1.5, "note": None})
+
+    def test_renderer_handles_what_orjson_rejects(self):
+        data = {1: "int key", "big": 2 ** 70, "nested": [{2.5: None}]}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(json.loads(ORJSONRenderer().render({1: "a"})), {"1": "a"})
+
+
+class AuthorListTestCase(APITestCase):
+    """Tests for the paginated author list."""
+
+    def setUp(self):
+        for i in range(25):
+            author = Author.objects.create(name=f"Author {i:02d}")
+            for year in (2003, 2001, 2002):
+                Book.objects.create(title=f"Book {i}-{year}", publication_year=year, author=author)
+        self.url = reverse("author-list")
+
+    def test_books_are_prefetched_per_page(self):
+        # Count, authors, books for the whole page.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 20)
+        books = response.data["results"][0]["books"]
+        self.assertEqual([book["publication_year"] for book in books], [2001, 2002, 2003])
+
+    def test_books_limit(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {"books_limit": 2, "page": 2})
+        self.assertEqual(len(response.data["results"]), 5)
+        for author in response.data["results"]:
+            self.assertEqual([book["publication_year"] for book in author["books"]], [2001, 2002])
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"fields": "name"})
+        self.assertEqual(response.data["results"][0], {"name": "Author 00"})
+
+        response = self.client.get(self.url, {"book_fields": "title", "page_size": 1})
+        self.assertEqual(response.data["results"][0]["books"][0], {"title": "Book 0-2001"})
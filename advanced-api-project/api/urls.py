@@ -1,12 +1,13 @@
 from django.urls import path
-from .views import author_list
+from .views import AuthorListView, author_export
 from .views import (
     BookListView, BookDetailView,
     BookCreateView, BookUpdateView, BookDeleteView
 )
 
 urlpatterns = [
-    path('authors/', author_list),
+    path('authors/', AuthorListView.as_view(), name='author-list'),
+    path('authors/export/', author_export, name='author-export'),
     path('books/', BookListView.as_view(), name='book-list'),
     path('books/<int:pk>/', BookDetailView.as_view(), name='book-detail'),
     path('books/create/', BookCreateView.as_view(), name='book-create'),
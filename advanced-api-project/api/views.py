@@ -1,13 +1,90 @@
-from rest_framework.response import Response
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from rest_framework import generics, permissions
 from rest_framework.decorators import api_view
-from .models import Author
+from rest_framework.pagination import PageNumberPagination
+from .models import Author, Book
 from .serializers import AuthorSerializer
+from .renderers import StreamingJSONResponse
 
+
+def ordered_books(limit=None):
+    """
+    Prefetch for an author's books, oldest first, optionally only the first `limit`.
+    The limit is applied per author with a ROW_NUMBER() window, so the page's
+    books still come from a single query.
+    """
+    books = Book.objects.order_by('publication_year', 'id')
+    if limit is not None:
+        books = books.annotate(
+            position=Window(RowNumber(), partition_by=F('author_id'), order_by=[F('publication_year'), F('id')])
+        ).filter(position__lte=limit)
+    return Prefetch('books', queryset=books)
+
+
+class AuthorPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# List authors with their books (paginated, open to everyone)
+class AuthorListView(generics.ListAPIView):
+    """
+    GET: Retrieve a page of authors with their nested books.
+    The books of the whole page are loaded with one query.
+
+    Query parameters:
+    - page, page_size: Pagination (20 authors per page by default, at most 100).
+    - books_limit: Only include each author's first N books.
+    Example: /api/authors/?books_limit=3
+    - fields: Author fields to include.
+    Example: /api/authors/?fields=name
+    - book_fields: Fields to include for each book.
+    Example: /api/authors/?book_fields=title,publication_year
+    """
+    serializer_class = AuthorSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = AuthorPagination
+    filter_backends = []
+
+    def get_list_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        return [field.strip() for field in value.split(',') if field.strip()]
+
+    def get_books_limit(self):
+        try:
+            limit = int(self.request.query_params['books_limit'])
+        except (KeyError, ValueError):
+            return None
+        return limit if limit > 0 else None
+
+    def get_queryset(self):
+        queryset = Author.objects.order_by('name', 'id')
+        fields = self.get_list_param('fields')
+        # Authors-only responses skip the books query entirely.
+        if fields is None or 'books' in fields:
+            queryset = queryset.prefetch_related(ordered_books(self.get_books_limit()))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_list_param('fields'))
+        kwargs.setdefault('book_fields', self.get_list_param('book_fields'))
+        return super().get_serializer(*args, **kwargs)
+
+
+# Export every author with their books as one streamed JSON array
 @api_view(['GET'])
-def author_list(request):
-    authors = Author.objects.all()
-    serializer = AuthorSerializer(authors, many=True)
-    return Response(serializer.data)
+def author_export(request):
+    """
+    GET: Stream all authors with their nested books.
+    Authors are read in chunks, each with one prefetch query for its books,
+    so memory stays bounded however many authors there are.
+    """
+    authors = Author.objects.order_by('pk').prefetch_related(ordered_books())
+    return StreamingJSONResponse(authors, AuthorSerializer, chunk_size=500)
 
 from django_filters import rest_framework
 from rest_framework import generics, permissions, filters
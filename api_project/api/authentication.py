@@ -0,0 +1,58 @@
+"""
+Token authentication backed by Django's cache.
+
+DRF's TokenAuthentication loads the Token and its User from the database on
+every request. CachedTokenAuthentication keeps authenticated tokens (with
+their user) in Django's default cache for ``TOKEN_AUTH_CACHE_TIMEOUT``
+seconds, so repeat requests authenticate without a query. Entries are dropped
+when the token is deleted and when the user is saved (password change,
+deactivation).
+
+This is the shared-cache half of social_media_api's accounts.authentication;
+the two projects are deployed separately and share no package to import it
+from.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def get_cache_timeout():
+    return getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300)
+
+
+def cache_key(key):
+    # Raw token keys are credentials; keep them out of the cache's key space.
+    return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that serves repeat requests from the cache.
+    """
+
+    def authenticate_credentials(self, key):
+        token = cache.get(cache_key(key))
+        if token is not None:
+            return (token.user, token)
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key(key), token, get_cache_timeout())
+        return (user, token)
+
+
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """
+    ``post_save`` receiver for the user model.
+    """
+    keys = Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    cache.delete_many([cache_key(key) for key in keys])
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """
+    ``post_delete`` receiver for Token.
+    """
+    cache.delete(cache_key(instance.key))
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from . import caching, search, tag_index
+        caching.connect_signals()
+        search.connect_signals()
+        tag_index.connect_signals()
@@ -0,0 +1,121 @@
+"""
+Versioned caching for the blog's read pages.
+
+Every post has a version number in the cache, and so does the post list as
+a whole. Cached fragments and pages include the version in their key, so
+bumping a version makes everything rendered from the old data unreachable
+at once; the stale entries simply expire. The receivers at the bottom of
+this module bump the versions when a post, one of its comments or its tags
+change.
+
+Versions start from the current time in milliseconds rather than from 1, so
+a version that was evicted from the cache never comes back with a value an
+older fragment was stored under.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse
+
+from .models import Comment, Post
+
+POST_LIST_VERSION_KEY = 'blog:posts:version'
+
+
+def get_fragment_timeout():
+    return getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 600)
+
+
+def get_page_timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 300)
+
+
+def post_version_key(post_id):
+    return f'blog:post:{post_id}:version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not in the cache: any fresh value is newer than the fragments stored so far.
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def get_post_version(post_id):
+    return get_version(post_version_key(post_id))
+
+
+def get_post_list_version():
+    return get_version(POST_LIST_VERSION_KEY)
+
+
+def invalidate_post(post_id):
+    bump_version(post_version_key(post_id))
+    bump_version(POST_LIST_VERSION_KEY)
+
+
+class AnonymousPageCacheMixin:
+    """
+    Caches the whole rendered page of a ListView for anonymous GET requests,
+    keyed on the full URL and the post list version. Signed-in users always
+    get a fresh page.
+    """
+
+    def get_page_cache_key(self):
+        path = hashlib.md5(self.request.get_full_path().encode('utf-8')).hexdigest()
+        return f'blog:page:{type(self).__name__}:{get_post_list_version()}:{path}'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.get_page_cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key, (rendered.content, rendered['Content-Type']), get_page_timeout()
+                )
+            )
+        return response
+
+
+def on_post_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_post(instance.pk)
+
+
+def on_comment_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(post_version_key(instance.post_id))
+
+
+def on_tags_changed(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse and isinstance(instance, Post):
+        invalidate_post(instance.pk)
+
+
+def connect_signals():
+    post_save.connect(on_post_changed, sender=Post, dispatch_uid='blog.caching.post_saved')
+    post_delete.connect(on_post_changed, sender=Post, dispatch_uid='blog.caching.post_deleted')
+    post_save.connect(on_comment_changed, sender=Comment, dispatch_uid='blog.caching.comment_saved')
+    post_delete.connect(on_comment_changed, sender=Comment, dispatch_uid='blog.caching.comment_deleted')
+    m2m_changed.connect(on_tags_changed, sender=Post.tags.through, dispatch_uid='blog.caching.tags_changed')
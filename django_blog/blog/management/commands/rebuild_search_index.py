@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post search index from the posts in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Posts read per query.")
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt the search index with {type(backend).__name__}.")
@@ -0,0 +1,72 @@
+from django.db import migrations, transaction
+from django.db.utils import OperationalError
+
+# Space-separated tag names of post p, for the index's tags column.
+TAGS_SQL = (
+    "SELECT GROUP_CONCAT(t.name {separator}) FROM taggit_taggeditem ti "
+    "JOIN taggit_tag t ON t.id = ti.tag_id "
+    "JOIN django_content_type ct ON ct.id = ti.content_type_id "
+    "WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id"
+)
+
+MYSQL_CREATE = """
+CREATE TABLE blog_post_search (
+    post_id BIGINT NOT NULL PRIMARY KEY,
+    title VARCHAR(200) NOT NULL,
+    content LONGTEXT NOT NULL,
+    tags TEXT NOT NULL,
+    FULLTEXT KEY blog_post_search_title (title),
+    FULLTEXT KEY blog_post_search_document (title, content, tags)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+MYSQL_FILL = (
+    "INSERT INTO blog_post_search (post_id, title, content, tags) "
+    "SELECT p.id, p.title, p.content, COALESCE((" + TAGS_SQL.format(separator="SEPARATOR ' '") + "), '') "
+    "FROM blog_post p"
+)
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE blog_post_search USING fts5("
+    "title, content, tags, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+SQLITE_FILL = (
+    "INSERT INTO blog_post_search (rowid, title, content, tags) "
+    "SELECT p.id, p.title, p.content, COALESCE((" + TAGS_SQL.format(separator=", ' '") + "), '') "
+    "FROM blog_post p"
+)
+
+
+def create_search_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute(MYSQL_CREATE)
+        schema_editor.execute(MYSQL_FILL)
+    elif connection.vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(SQLITE_CREATE)
+        except OperationalError:
+            # SQLite built without FTS5: blog.search falls back to its on-disk index.
+            return
+        schema_editor.execute(SQLITE_FILL)
+    # Other databases use the on-disk index; see blog.search.
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('mysql', 'sqlite'):
+        schema_editor.execute("DROP TABLE IF EXISTS blog_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_tags_alter_post_author'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
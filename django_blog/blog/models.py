@@ -1,18 +1,43 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils.text import Truncator
 from taggit.managers import TaggableManager
 
+EXCERPT_WORDS = 20
+
+
+def make_excerpt(content):
+    return Truncator(content).words(EXCERPT_WORDS)
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
+    # First words of content, kept up to date by save(), so that lists of posts need not load content.
+    excerpt = models.TextField(blank=True, editable=False)
     published_date = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     tags = TaggableManager()  # New field for tags
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-published_date', '-id'], name='blog_post_published_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+    def get_absolute_url(self):
+        return reverse("post_detail", kwargs={"pk": self.pk})
+
 
 # Comment Model
 
@@ -27,3 +52,6 @@ class Comment(models.Model):
 
     def __str__(self):
         return f"{self.author.username} - {self.content[:20]}"
+
+    def get_absolute_url(self):
+        return reverse("post_detail", kwargs={"pk": self.post_id})
@@ -0,0 +1,395 @@
+"""
+Full-text search over post titles, content and tags.
+
+Each post is indexed as one document with three fields (title, content,
+tags). A query matches the posts containing every one of its words, ranked
+by relevance with title and tag matches weighted above content matches.
+The index is kept current by the signal receivers at the bottom of this
+module; ``python manage.py rebuild_search_index`` rebuilds it from scratch.
+
+The backend is chosen from the database in use, or forced with ``SEARCH_BACKEND``:
+
+* ``blog.search.MySQLBackend`` queries the FULLTEXT indexes of the
+  ``blog_post_search`` table (created by migration 0004).
+* ``blog.search.SQLiteBackend`` queries the FTS5 table ``blog_post_search``
+  (created by migration 0004 when SQLite has FTS5) and ranks with bm25().
+* ``blog.search.DiskIndexBackend`` keeps a pure-Python inverted index in a
+  ``shelve`` file at ``SEARCH_INDEX_PATH``, for other databases. It is meant
+  for a single process: other processes do not see its writes until they
+  reopen the file, which happens on every call.
+"""
+import dbm
+import math
+import re
+import shelve
+import threading
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+TABLE = 'blog_post_search'
+
+# Relative weight of a word occurring in each field.
+TITLE_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+TAGS_WEIGHT = 3.0
+
+_word_re = re.compile(r'\w+')
+
+
+def get_max_terms():
+    return getattr(settings, 'SEARCH_MAX_TERMS', 8)
+
+
+def get_index_path():
+    path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+    return Path(path) if path else Path(settings.BASE_DIR) / 'search_index' / 'posts'
+
+
+def tokenize(text):
+    return _word_re.findall(text.lower())
+
+
+def parse_query(query):
+    """
+    Return the distinct words of ``query``, in order, at most SEARCH_MAX_TERMS of them.
+    """
+    terms = []
+    for term in tokenize(query or ''):
+        if term not in terms:
+            terms.append(term)
+    return terms[:get_max_terms()]
+
+
+def document(post):
+    """
+    The (title, content, tags) text indexed for ``post``.
+    """
+    # tags.all() rather than tags.names(), so that prefetched tags are used.
+    return post.title, post.content, ' '.join(sorted(tag.name for tag in post.tags.all()))
+
+
+class SearchBackend:
+    # Whether index writes belong in the current database transaction. Other
+    # backends write once the transaction commits.
+    transactional = True
+
+    def index_post(self, post):
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        raise NotImplementedError
+
+    def count(self, terms):
+        raise NotImplementedError
+
+    def search(self, terms, offset, limit):
+        """
+        Return the ids of the matching posts ranked ``offset`` to ``offset + limit``, best first.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def rebuild(self, chunk_size=1000):
+        posts = Post.objects.prefetch_related('tags').order_by('pk')
+        with transaction.atomic():
+            self.clear()
+            for post in posts.iterator(chunk_size=chunk_size):
+                self.index_post(post)
+
+
+class SQLBackend(SearchBackend):
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE {self.id_column} = %s", [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+
+    def fetch_column(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLBackend(SQLBackend):
+    id_column = 'post_id'
+
+    def match_expression(self, terms):
+        # Boolean mode, every word required.
+        return ' '.join(f'+{term}' for term in terms)
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"REPLACE INTO {TABLE} (post_id, title, content, tags) VALUES (%s, %s, %s, %s)",
+                [post.pk, *document(post)],
+            )
+
+    def count(self, terms):
+        sql = f"SELECT COUNT(*) FROM {TABLE} WHERE MATCH(title, content, tags) AGAINST (%s IN BOOLEAN MODE)"
+        return self.fetch_column(sql, [self.match_expression(terms)])[0]
+
+    def search(self, terms, offset, limit):
+        expression = self.match_expression(terms)
+        sql = (
+            f"SELECT post_id FROM {TABLE} "
+            f"WHERE MATCH(title, content, tags) AGAINST (%s IN BOOLEAN MODE) "
+            f"ORDER BY MATCH(title) AGAINST (%s IN BOOLEAN MODE) * %s "
+            f"+ MATCH(title, content, tags) AGAINST (%s IN BOOLEAN MODE) DESC, post_id DESC "
+            f"LIMIT %s OFFSET %s"
+        )
+        params = [expression, expression, TITLE_WEIGHT, expression, limit, offset]
+        return self.fetch_column(sql, params)
+
+
+class SQLiteBackend(SQLBackend):
+    id_column = 'rowid'
+
+    def match_expression(self, terms):
+        # Quoted so that words like AND/OR/NOT are not read as operators; juxtaposition means AND.
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [post.pk])
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)",
+                [post.pk, *document(post)],
+            )
+
+    def count(self, terms):
+        sql = f"SELECT COUNT(*) FROM {TABLE} WHERE {TABLE} MATCH %s"
+        return self.fetch_column(sql, [self.match_expression(terms)])[0]
+
+    def search(self, terms, offset, limit):
+        # bm25() is lower for better matches.
+        sql = (
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+            f"ORDER BY bm25({TABLE}, %s, %s, %s), rowid DESC LIMIT %s OFFSET %s"
+        )
+        params = [self.match_expression(terms), TITLE_WEIGHT, CONTENT_WEIGHT, TAGS_WEIGHT, limit, offset]
+        return self.fetch_column(sql, params)
+
+
+class DiskIndexBackend(SearchBackend):
+    """
+    Inverted index in a shelve file. Each word maps to its postings: the
+    sorted ids of the posts containing it and, in the same order, the
+    field-weighted number of occurrences. Each post maps to its words, so it
+    can be taken out of their postings when it changes.
+
+    Ranking is BM25 without length normalization, so scoring a match needs
+    nothing beyond the postings of the query words.
+    """
+    transactional = False
+    k1 = 1.2
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else get_index_path()
+        self._lock = threading.Lock()
+
+    def open(self, flag='c'):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return shelve.open(str(self.path), flag=flag)
+
+    @staticmethod
+    def weighted_terms(post):
+        weights = {}
+        for text, weight in zip(document(post), (TITLE_WEIGHT, CONTENT_WEIGHT, TAGS_WEIGHT)):
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + weight
+        return weights
+
+    @staticmethod
+    def _unlink(db, post_id):
+        terms = db.pop(f'd:{post_id}', None)
+        if terms is None:
+            return False
+        for term in terms:
+            key = f't:{term}'
+            ids, weights = db[key]
+            i = bisect_left(ids, post_id)
+            if i < len(ids) and ids[i] == post_id:
+                del ids[i]
+                del weights[i]
+            if ids:
+                db[key] = (ids, weights)
+            else:
+                del db[key]
+        return True
+
+    def _link(self, db, post):
+        post_id = post.pk
+        terms = self.weighted_terms(post)
+        existed = self._unlink(db, post_id)
+        for term, weight in terms.items():
+            key = f't:{term}'
+            ids, weights = db.get(key) or (array('q'), array('d'))
+            i = bisect_left(ids, post_id)
+            ids.insert(i, post_id)
+            weights.insert(i, weight)
+            db[key] = (ids, weights)
+        db[f'd:{post_id}'] = list(terms)
+        if not existed:
+            db['n'] = db.get('n', 0) + 1
+
+    def index_post(self, post):
+        with self._lock, self.open() as db:
+            self._link(db, post)
+
+    def remove_post(self, post_id):
+        with self._lock, self.open() as db:
+            if self._unlink(db, post_id):
+                db['n'] = db.get('n', 1) - 1
+
+    def clear(self):
+        with self._lock, self.open(flag='n'):
+            pass
+
+    def rebuild(self, chunk_size=1000):
+        # One open file for the whole run rather than one per post.
+        posts = Post.objects.prefetch_related('tags').order_by('pk')
+        with self._lock, self.open(flag='n') as db:
+            for post in posts.iterator(chunk_size=chunk_size):
+                self._link(db, post)
+
+    def postings(self, terms):
+        """
+        Return the postings of ``terms`` and the number of indexed posts, or
+        (None, 0) if some word occurs nowhere.
+        """
+        try:
+            db = self.open(flag='r')
+        except dbm.error:  # The index has not been built yet.
+            return None, 0
+        with db:
+            postings = [db.get(f't:{term}') for term in terms]
+            total = db.get('n', 0)
+        if not all(postings):
+            return None, 0
+        return postings, total
+
+    def matches(self, terms):
+        """
+        Return {post_id: score} for the posts containing every word of ``terms``.
+        """
+        postings, total = self.postings(terms)
+        if not postings:
+            return {}
+        postings.sort(key=lambda entry: len(entry[0]))
+        ids, weights = postings[0]
+        scores = dict(zip(ids, self.scores(weights, len(ids), total)))
+        for ids, weights in postings[1:]:
+            term_scores = dict(zip(ids, self.scores(weights, len(ids), total)))
+            scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+            if not scores:
+                break
+        return scores
+
+    def scores(self, weights, frequency, total):
+        idf = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+        k1 = self.k1
+        return [idf * weight * (k1 + 1) / (weight + k1) for weight in weights]
+
+    def count(self, terms):
+        return len(self.matches(terms))
+
+    def search(self, terms, offset, limit):
+        ranked = sorted(self.matches(terms).items(), key=lambda item: (-item[1], -item[0]))
+        return [pk for pk, _ in ranked[offset:offset + limit]]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'mysql':
+        return MySQLBackend()
+    if connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names():
+        return SQLiteBackend()
+    return DiskIndexBackend()
+
+
+class SearchResults:
+    """
+    The posts matching ``query``, best first. Supports ``count()`` and
+    slicing, so it can be handed to a Paginator: each page runs one ranked
+    query for its ids and one query for the posts.
+    """
+
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.terms = parse_query(query)
+        self.backend = backend or get_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if not self.terms or stop <= start:
+            return []
+        ids = self.backend.search(self.terms, start, stop - start)
+        posts = Post.objects.select_related('author').in_bulk(ids)
+        # A post deleted since it was indexed is skipped.
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    return SearchResults(query)
+
+
+def _on_commit_or_now(backend, func, *args):
+    if backend.transactional:
+        func(*args)
+    else:
+        transaction.on_commit(lambda: func(*args))
+
+
+def on_post_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    backend = get_backend()
+    _on_commit_or_now(backend, backend.index_post, instance)
+
+
+def on_post_deleted(sender, instance, **kwargs):
+    backend = get_backend()
+    _on_commit_or_now(backend, backend.remove_post, instance.pk)
+
+
+def on_tags_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse or not isinstance(instance, Post):
+        return
+    backend = get_backend()
+    _on_commit_or_now(backend, backend.index_post, instance)
+
+
+def connect_signals():
+    post_save.connect(on_post_saved, sender=Post, dispatch_uid='blog.search.post_saved')
+    post_delete.connect(on_post_deleted, sender=Post, dispatch_uid='blog.search.post_deleted')
+    m2m_changed.connect(on_tags_changed, sender=Post.tags.through, dispatch_uid='blog.search.tags_changed')
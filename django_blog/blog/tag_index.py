@@ -0,0 +1,110 @@
+"""
+Cached tag lookups for the tag pages.
+
+* ``get_tag(slug)``: the tag's id, name and slug.
+* ``get_post_ids(tag_id)``: the ids of the posts with the tag, newest first,
+  as an ``array('q')``. A page of a tag listing is a slice of it followed by
+  one primary key lookup, instead of a join through taggit's generic
+  tagged-item table.
+* ``get_tag_cloud()``: every tag used on a post with its number of posts.
+
+Entries are computed on first use and kept until a tag assignment changes:
+the receivers at the bottom of this module drop the posting list of the
+affected tag and the cloud whenever a post's tagged item is created or
+deleted (which also covers deleting a post), and the slug entry when a tag
+is saved or deleted.
+"""
+from array import array
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_save
+from taggit.models import Tag, TaggedItem
+
+from .models import Post
+
+TAG_CLOUD_KEY = 'blog:tags:cloud'
+
+
+def get_cache_timeout():
+    return getattr(settings, 'TAG_INDEX_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def tag_key(slug):
+    return f'blog:tag:slug:{slug}'
+
+
+def post_ids_key(tag_id):
+    return f'blog:tag:{tag_id}:posts'
+
+
+def get_tag(slug):
+    """
+    Return the (id, name, slug) of the tag with ``slug``, or None.
+    """
+    key = tag_key(slug)
+    tag = cache.get(key)
+    if tag is None:
+        tag = Tag.objects.filter(slug=slug).values_list('id', 'name', 'slug').first()
+        if tag is None:
+            return None
+        cache.set(key, tag, get_cache_timeout())
+    return tag
+
+
+def get_post_ids(tag_id):
+    key = post_ids_key(tag_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = array('q', (
+            Post.objects.filter(tags__id=tag_id)
+            .order_by('-published_date', '-id')
+            .values_list('id', flat=True)
+        ))
+        cache.set(key, ids, get_cache_timeout())
+    return ids
+
+
+def get_tag_cloud():
+    """
+    Return [{'name', 'slug', 'count'}] for the tags used on posts, by name.
+    """
+    cloud = cache.get(TAG_CLOUD_KEY)
+    if cloud is None:
+        content_type = ContentType.objects.get_for_model(Post)
+        cloud = list(
+            TaggedItem.objects.filter(content_type=content_type)
+            .values('tag__name', 'tag__slug')
+            .annotate(count=Count('id'))
+            .order_by('tag__name')
+        )
+        cloud = [{'name': row['tag__name'], 'slug': row['tag__slug'], 'count': row['count']} for row in cloud]
+        cache.set(TAG_CLOUD_KEY, cloud, get_cache_timeout())
+    return cloud
+
+
+def on_tagged_item_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.content_type_id != ContentType.objects.get_for_model(Post).pk:
+        return
+    cache.delete_many([post_ids_key(instance.tag_id), TAG_CLOUD_KEY])
+
+
+def on_tag_saving(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    # Drop the entry under the slug the tag had until now, which a rename changes.
+    old_slug = Tag.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+    cache.delete_many([tag_key(old_slug or instance.slug), TAG_CLOUD_KEY])
+
+
+def on_tag_deleted(sender, instance, **kwargs):
+    cache.delete_many([tag_key(instance.slug), TAG_CLOUD_KEY])
+
+
+def connect_signals():
+    post_save.connect(on_tagged_item_changed, sender=TaggedItem, dispatch_uid='blog.tag_index.item_saved')
+    post_delete.connect(on_tagged_item_changed, sender=TaggedItem, dispatch_uid='blog.tag_index.item_deleted')
+    pre_save.connect(on_tag_saving, sender=Tag, dispatch_uid='blog.tag_index.tag_saving')
+    post_delete.connect(on_tag_deleted, sender=Tag, dispatch_uid='blog.tag_index.tag_deleted')
@@ -1,3 +1,237 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import search
+from .models import Comment, Post
+
+
+class PostSearchTestCase(TestCase):
+    def setUp(self):
+        search.get_backend.cache_clear()
+        self.addCleanup(search.get_backend.cache_clear)
+        self.user = User.objects.create_user(username='writer', password='pass1234')
+
+    def create_post(self, title, content, tags=()):
+        post = Post.objects.create(author=self.user, title=title, content=content)
+        post.tags.add(*tags)
+        return post
+
+    def result_titles(self, query, **params):
+        response = self.client.get(reverse('post_search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [post.title for post in response.context['results']]
+
+    def test_missing_query_returns_no_results(self):
+        self.create_post('Django tips', 'Some content')
+        response = self.client.get(reverse('post_search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['results']), [])
+
+    def test_matches_every_word_ranked_by_field(self):
+        self.create_post('Cooking at home', 'Nothing about python or django here')
+        self.create_post('Python and Django', 'A web framework')
+        self.create_post('Weekend notes', 'Django django python', tags=['misc'])
+        self.create_post('Python only', 'No framework')
+        self.assertEqual(
+            self.result_titles('django python'),
+            ['Python and Django', 'Weekend notes', 'Cooking at home'],
+        )
+
+    def test_index_follows_edits_tags_and_deletes(self):
+        post = self.create_post('Draft', 'Plain text')
+        self.assertEqual(self.result_titles('tutorial'), [])
+
+        post.tags.add('tutorial')
+        self.assertEqual(self.result_titles('tutorial'), ['Draft'])
+
+        post.title = 'Published'
+        post.save()
+        self.assertEqual(self.result_titles('draft'), [])
+        self.assertEqual(self.result_titles('published'), ['Published'])
+
+        post.delete()
+        self.assertEqual(self.result_titles('published'), [])
+
+    def test_paginates_results(self):
+        for i in range(12):
+            self.create_post(f'Post {i}', 'shared words')
+        response = self.client.get(reverse('post_search'), {'q': 'shared', 'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertEqual(len(response.context['results']), 2)
+
+    def test_disk_index_backend(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            SEARCH_BACKEND='blog.search.DiskIndexBackend', SEARCH_INDEX_PATH=f'{directory}/posts'
+        ):
+            search.get_backend.cache_clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_post('Python and Django', 'A web framework')
+                post = self.create_post('Weekend notes', 'Django django python', tags=['misc'])
+            self.assertEqual(self.result_titles('django python'), ['Python and Django', 'Weekend notes'])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                post.delete()
+            self.assertEqual(self.result_titles('django'), ['Python and Django'])
+
+            search.get_backend().rebuild()
+            self.assertEqual(self.result_titles('framework'), ['Python and Django'])
+
+
+class PostCachingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass1234')
+        self.post = Post.objects.create(author=self.user, title='First post', content='Hello')
+
+    def test_post_list_page_is_cached_for_anonymous_visitors(self):
+        url = reverse('post_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'First post')
+
+        Post.objects.create(author=self.user, title='Second post', content='Hello again')
+        self.assertContains(self.client.get(url), 'Second post')
+
+    def test_post_list_is_not_cached_for_signed_in_users(self):
+        self.client.login(username='writer', password='pass1234')
+        self.client.get(reverse('post_list'))
+        Post.objects.filter(pk=self.post.pk).update(title='Renamed without signals')
+        self.assertContains(self.client.get(reverse('post_list')), 'Renamed without signals')
+
+    def test_detail_fragments_are_invalidated_by_comments_and_tags(self):
+        url = reverse('post_detail', kwargs={'pk': self.post.pk})
+        self.client.get(url)
+        with self.assertNumQueries(1):  # The post with its author; no comments or tags.
+            self.client.get(url)
+
+        Comment.objects.create(post=self.post, author=self.user, content='Nice post')
+        self.post.tags.add('news')
+        response = self.client.get(url)
+        self.assertContains(response, 'Nice post')
+        self.assertContains(response, 'news')
+
+    def test_comment_author_sees_edit_links(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='Mine')
+        url = reverse('post_detail', kwargs={'pk': self.post.pk})
+        edit_url = reverse('comment_update', kwargs={'pk': comment.pk})
+        self.assertNotContains(self.client.get(url), edit_url)
+        self.client.login(username='writer', password='pass1234')
+        self.assertContains(self.client.get(url), edit_url)
+
+
+class PostDetailQueriesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass1234')
+        self.post = Post.objects.create(author=self.user, title='Popular post', content='Hello')
+        self.post.tags.add('news', 'django')
+        commenters = [User.objects.create_user(username=f'reader{i}') for i in range(5)]
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=commenters[i % 5], content=f'Comment {i:03}') for i in range(120)
+        )
+
+    def test_query_count_does_not_grow_with_comments(self):
+        # The post with its author, the comment count, one page of comments with their authors, the tags.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('post_detail', kwargs={'pk': self.post.pk}))
+        self.assertContains(response, 'Comment 000')
+        self.assertContains(response, 'Comment 049')
+        self.assertNotContains(response, 'Comment 050')
+        self.assertContains(response, 'news')
+
+    def test_comments_are_paginated(self):
+        url = reverse('post_detail', kwargs={'pk': self.post.pk})
+        response = self.client.get(url, {'comments_page': 3})
+        self.assertContains(response, 'Comment 119')
+        self.assertNotContains(response, 'Comment 099')
+        self.assertContains(response, 'Page 3 of 3')
+
+
+class PostListPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass1234')
+        for i in range(45):
+            Post.objects.create(author=self.user, title=f'Post {i:02}', content=f'Body of post {i:02}. ' * 20)
+
+    def test_pages_load_summaries_with_authors(self):
+        with self.assertNumQueries(2):  # The count and the page.
+            response = self.client.get(reverse('post_list'))
+        posts = response.context['posts']
+        self.assertEqual([post.title for post in posts][:2], ['Post 44', 'Post 43'])
+        self.assertEqual(len(posts), 20)
+        self.assertIn('content', posts[0].get_deferred_fields())
+        self.assertContains(response, 'By writer')
+        self.assertEqual(posts[0].excerpt, ' '.join(['Body of post 44.'] * 5) + '…')
+
+    def test_keyset_pages_follow_the_cursor(self):
+        response = self.client.get(reverse('post_list'))
+        titles = []
+        while True:
+            titles += [post.title for post in response.context['posts']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+            response = self.client.get(reverse('post_list'), {'before': cursor})
+        self.assertEqual(titles, [f'Post {i:02}' for i in reversed(range(45))])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('post_list'), {'before': 'nonsense'}).status_code, 404)
+
+    def test_excerpt_follows_content(self):
+        post = Post.objects.get(title='Post 00')
+        post.content = 'Short now'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Short now')
+
+
+class TagIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass1234')
+        self.posts = []
+        for i in range(25):
+            post = Post.objects.create(author=self.user, title=f'Post {i:02}', content='Body')
+            post.tags.add('django' if i % 5 else 'python')
+            self.posts.append(post)
+
+    def test_tag_pages_are_served_from_the_posting_list(self):
+        url = reverse('posts_by_tag', kwargs={'tag_slug': 'django'})
+        response = self.client.get(url)
+        self.assertEqual(
+            [post.title for post in response.context['posts']][:3], ['Post 24', 'Post 23', 'Post 22']
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 20)
+        with self.assertNumQueries(1):  # The posts of the page.
+            self.client.get(url, {'page': 1})
+
+    def test_posting_list_follows_tag_changes(self):
+        url = reverse('posts_by_tag', kwargs={'tag_slug': 'python'})
+        self.client.get(url)
+        self.posts[1].tags.add('python')
+        self.posts[0].delete()
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 5)
+        self.assertIn('Post 01', [post.title for post in response.context['posts']])
+        self.assertNotIn('Post 00', [post.title for post in response.context['posts']])
+
+    def test_unknown_tag(self):
+        response = self.client.get(reverse('posts_by_tag', kwargs={'tag_slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tag_cloud(self):
+        response = self.client.get(reverse('tag_cloud'))
+        self.assertEqual(
+            response.context['tags'],
+            [{'name': 'django', 'slug': 'django', 'count': 20}, {'name': 'python', 'slug': 'python', 'count': 5}],
+        )
+        self.posts[1].tags.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('tag_cloud'))
+        self.assertEqual(response.context['tags'][0]['count'], 19)
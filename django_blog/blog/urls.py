@@ -3,6 +3,7 @@ from django.contrib.auth import views as auth_views
 from . import views
 from .views import (
     PostByTagListView,
+    TagCloudView,
     PostListView,
     PostDetailView,
     PostCreateView,
@@ -28,7 +29,8 @@ urlpatterns = [
     path('post/<int:pk>/update/', PostUpdateView.as_view(), name='post_edit'), 
     path('post/<int:pk>/delete/', PostDeleteView.as_view(), name='post_delete'),
 
-    # Tag view
+    # Tag views
+    path('tags/', TagCloudView.as_view(), name='tag_cloud'),
     path('tags/<slug:tag_slug>/', PostByTagListView.as_view(), name='posts_by_tag'),
 
     # Comment URLs
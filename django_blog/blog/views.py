@@ -20,22 +20,94 @@ def profile_view(request):
 
 '''CRUD Views'''
 
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from .caching import AnonymousPageCacheMixin, get_fragment_timeout, get_post_version
 from .forms import  PostForm, RegisterForm
 from .models import Post
 
-# List all posts
-class PostListView(ListView):
+# List all posts (whole page cached for anonymous visitors)
+class PostListView(AnonymousPageCacheMixin, ListView):
     model = Post
     template_name = "blog/post_list.html"
     context_object_name = "posts"
-    ordering = ['-published_date']
+    ordering = ['-published_date', '-id']
+    paginate_by = 20
+
+    def get_queryset(self):
+        # The excerpt stands in for content, which is never loaded here.
+        return super().get_queryset().select_related('author').only(
+            'id', 'title', 'excerpt', 'published_date', 'author__id', 'author__username'
+        )
+
+    @staticmethod
+    def make_cursor(post):
+        return f"{post.published_date.isoformat()}_{post.pk}"
+
+    @staticmethod
+    def parse_cursor(cursor):
+        published_date, _, pk = cursor.rpartition('_')
+        try:
+            return datetime.fromisoformat(published_date), int(pk)
+        except ValueError:
+            raise Http404("Invalid cursor.")
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get('before')
+        if cursor is None:
+            return super().paginate_queryset(queryset, page_size)
+        # Keyset page: the posts after the cursor in list order. Unlike
+        # ?page=N it costs the same however deep it is (no COUNT, no OFFSET).
+        published_date, pk = self.parse_cursor(cursor)
+        posts = list(queryset.filter(
+            Q(published_date__lt=published_date) | Q(published_date=published_date, pk__lt=pk)
+        )[:page_size + 1])
+        self.has_more = len(posts) > page_size
+        return None, None, posts[:page_size], False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        posts = list(context['posts'])  # Fills the queryset's cache; the template reuses it.
+        if context['page_obj'] is not None:
+            self.has_more = context['page_obj'].has_next()
+        context['next_cursor'] = self.make_cursor(posts[-1]) if posts and self.has_more else None
+        return context
 
 # View single post
 class PostDetailView(DetailView):
     model = Post
     template_name = "blog/post_detail.html"
+    comments_paginate_by = 50
+
+    def get_queryset(self):
+        return Post.objects.select_related('author')
+
+    def get_comments_page_number(self):
+        try:
+            return max(int(self.request.GET.get('comments_page', 1)), 1)
+        except ValueError:
+            return 1
+
+    def get_comments_page(self):
+        comments = self.object.comments.select_related('author').order_by('created_at', 'id')
+        paginator = Paginator(comments, self.comments_paginate_by)
+        return paginator.get_page(self.get_comments_page_number())
+
+    def get_context_data(self, **kwargs):
+        # The comment and tag fragments are cached under the post's version.
+        context = super().get_context_data(**kwargs)
+        context['post_version'] = get_post_version(self.object.pk)
+        context['fragment_timeout'] = get_fragment_timeout()
+        # Passed uncalled: the template only calls it, and queries the
+        # comments, when the comment fragment is not cached.
+        context['comments_page'] = self.get_comments_page
+        context['comments_page_number'] = self.get_comments_page_number()
+        return context
 
 # Create a new post
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -69,17 +141,31 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     
 # Post by tag
 from django.shortcuts import get_object_or_404
-from taggit.models import Tag
+from django.views.generic import TemplateView
+from . import tag_index
 
 class PostByTagListView(ListView):
     template_name = "blog/posts_by_tag.html"
     context_object_name = "posts"
+    paginate_by = 20
 
     def get_queryset(self):
-        # Get the tag based on the URL slug
-        self.tag = get_object_or_404(Tag, slug=self.kwargs['tag_slug'])
-        # Return posts that have this tag
-        return Post.objects.filter(tags__in=[self.tag])
+        # Get the tag based on the URL slug, from the tag index cache
+        tag = tag_index.get_tag(self.kwargs['tag_slug'])
+        if tag is None:
+            raise Http404("No such tag.")
+        self.tag = dict(zip(('id', 'name', 'slug'), tag))
+        # The ids of the posts with this tag, newest first; paginated below
+        return tag_index.get_post_ids(self.tag['id'])
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, ids, is_paginated = super().paginate_queryset(queryset, page_size)
+        # Load only the posts of this page, keeping the index order
+        posts = Post.objects.select_related('author').only(
+            'id', 'title', 'excerpt', 'published_date', 'author__id', 'author__username'
+        ).in_bulk(list(ids))
+        page.object_list = [posts[pk] for pk in ids if pk in posts]
+        return paginator, page, page.object_list, is_paginated
 
     def get_context_data(self, **kwargs):
         # Add the tag to the context
@@ -88,6 +174,16 @@ class PostByTagListView(ListView):
         return context
 
 
+# Tag cloud
+class TagCloudView(TemplateView):
+    template_name = "blog/tag_cloud.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tags'] = tag_index.get_tag_cloud()
+        return context
+
+
 '''Comment Views '''
 
 
@@ -107,14 +203,14 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     template_name = "blog/add_comment.html"
 
     def form_valid(self, form):
-        post_id = self.kwargs.get('post_id')
+        post_id = self.kwargs.get('pk')
         post = get_object_or_404(Post, id=post_id)
         form.instance.author = self.request.user
         form.instance.post = post
         return super().form_valid(form)
 
     def get_success_url(self):
-        post_id = self.kwargs.get('post_id')
+        post_id = self.kwargs.get('pk')
         return reverse_lazy('post_detail', kwargs={'pk': post_id})
 
 # Update comment
@@ -139,11 +235,15 @@ class CommentDeleteView(LoginRequiredMixin, DeleteView):
 
 
 # Search View
-from django.db.models import Q
+from .search import search
 
 def post_search(request):
-    query = request.GET.get('q')
-    results = Post.objects.filter(
-        Q(title__icontains=query) | Q(content__icontains=query) | Q(tags__name__icontains=query)
-    ).distinct()
-    return render(request, "blog/post_search.html", {"results": results, "query": query})
+    query = request.GET.get('q', '').strip()
+    # Ranked by relevance and paginated; each page is one index query plus one query for its posts.
+    paginator = Paginator(search(query), 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, "blog/post_search.html", {
+        "results": page_obj.object_list,
+        "page_obj": page_obj,
+        "query": query,
+    })
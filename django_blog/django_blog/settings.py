@@ -141,3 +141,20 @@ LOGIN_REDIRECT_URL = "profile"
 # After logout, users will be redirected to the URL pattern named 'login'
 
 LOGOUT_REDIRECT_URL = "login"
+
+# Post search (blog/search.py). The backend follows the database: MySQL
+# FULLTEXT, SQLite FTS5, or else a pure-Python index stored at SEARCH_INDEX_PATH.
+# SEARCH_BACKEND = 'blog.search.DiskIndexBackend'
+SEARCH_INDEX_PATH = BASE_DIR / 'search_index' / 'posts'
+# At most this many words of a query are searched for.
+SEARCH_MAX_TERMS = 8
+
+# Page and fragment caching (blog/caching.py). Without CACHES Django uses a
+# per-process local-memory cache; point CACHES at a shared cache (Redis,
+# Memcached) in production so every worker sees the same versions.
+BLOG_PAGE_CACHE_TIMEOUT = 300       # whole post list pages, anonymous visitors only
+BLOG_FRAGMENT_CACHE_TIMEOUT = 600   # comment and tag fragments of post pages
+
+# Tag pages (blog/tag_index.py): per-tag lists of post ids and the tag cloud
+# are cached until a tag assignment changes, or for at most this long.
+TAG_INDEX_CACHE_TIMEOUT = 24 * 60 * 60
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from . import authentication, follow_graph
+        from .models import User
+
+        m2m_changed.connect(follow_graph.on_follows_changed, sender=follow_graph.Follow)
+        post_save.connect(authentication.invalidate_user_tokens, sender=User)
+        post_delete.connect(authentication.invalidate_token, sender=Token)
@@ -0,0 +1,164 @@
+"""
+Token authentication backed by a two-tier cache.
+
+DRF's TokenAuthentication loads the Token and its User from the database on
+every request. CachedTokenAuthentication keeps authenticated tokens (with
+their user) in a small per-process LRU for ``TOKEN_AUTH_LOCAL_CACHE_TIMEOUT``
+seconds and in Django's default cache for ``TOKEN_AUTH_CACHE_TIMEOUT``
+seconds, so most requests authenticate without a query.
+
+Cached entries are dropped when the token is deleted (logout) and when the
+user is saved (password change, deactivation, profile edits). Other
+processes keep their LRU entry until it expires, which is why that tier's
+timeout is short. ``request.user`` may carry counters up to
+``TOKEN_AUTH_CACHE_TIMEOUT`` seconds old, since counters are updated without
+saving the user.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Per-process LRU in front of the shared cache, keyed by token key.
+    """
+
+    def __init__(self, maxsize=None, local_timeout=None, timeout=None):
+        self.maxsize = maxsize
+        self.local_timeout = local_timeout
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_maxsize(self):
+        if self.maxsize is not None:
+            return self.maxsize
+        return getattr(settings, 'TOKEN_AUTH_LOCAL_CACHE_SIZE', 1024)
+
+    def get_local_timeout(self):
+        if self.local_timeout is not None:
+            return self.local_timeout
+        return getattr(settings, 'TOKEN_AUTH_LOCAL_CACHE_TIMEOUT', 10)
+
+    def get_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300)
+
+    def cache_key(self, key):
+        # Raw token keys are credentials; keep them out of the shared cache's key space.
+        return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, token = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return token
+
+    def _set_local(self, key, token):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.get_local_timeout(), token)
+            self._local.move_to_end(key)
+            while len(self._local) > self.get_maxsize():
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        token = self._get_local(key)
+        if token is None:
+            token = cache.get(self.cache_key(key))
+            if token is not None:
+                self._set_local(key, token)
+        return token
+
+    async def aget(self, key):
+        token = self._get_local(key)
+        if token is None:
+            token = await cache.aget(self.cache_key(key))
+            if token is not None:
+                self._set_local(key, token)
+        return token
+
+    def set(self, key, token):
+        cache.set(self.cache_key(key), token, self.get_timeout())
+        self._set_local(key, token)
+
+    async def aset(self, key, token):
+        await cache.aset(self.cache_key(key), token, self.get_timeout())
+        self._set_local(key, token)
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        cache.delete_many([self.cache_key(key) for key in keys])
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that serves repeat requests from ``token_cache``.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is not None:
+            return (token.user, token)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token)
+        return (user, token)
+
+
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """
+    ``post_save`` receiver for the user model.
+    """
+    token_cache.invalidate(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """
+    ``post_delete`` receiver for Token.
+    """
+    token_cache.invalidate([instance.key])
+
+
+async def aauthenticate_token(request):
+    """
+    Resolve the user for an ``Authorization: Token <key>`` header in async views,
+    which cannot go through DRF's authentication classes. Returns None if the
+    header is missing or the token is invalid.
+    """
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0].lower() != 'token':
+        return None
+    key = parts[1]
+    token = await token_cache.aget(key)
+    if token is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        if not token.user.is_active:
+            return None
+        await token_cache.aset(key, token)
+    return token.user
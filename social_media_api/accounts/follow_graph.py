@@ -0,0 +1,175 @@
+"""
+Cached adjacency lists for the follow graph.
+
+For every user, the ids of the accounts they follow and the ids of their
+followers are kept in Django's default cache as sorted integer arrays. Follow
+checks, mutual follows and bulk lookups are then binary searches in memory
+instead of queries against the ``User.followers`` through table. Lists are
+loaded on a cache miss, several users at a time when possible.
+
+The lists are only ever used to answer reads. Writes go to the database
+first, and then the lists of both users are dropped and reloaded on their
+next read. A list edited in place would lose updates when two requests
+change it at once, and with a per-process cache it would not reflect writes
+made by other processes anyway.
+
+Because another process's cache may still hold the lists from before a
+follow, anything that decides what to write or whose posts to show (feed
+fan-out, the merge of celebrity posts) reads the table directly with
+``stream_follower_ids`` and ``following_among_in_db``. The cached lists only
+serve display reads such as "follows you" badges, which may lag by up to
+``FOLLOW_GRAPH_CACHE_TIMEOUT`` seconds in other processes.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+
+# Rows are (from_user=followed account, to_user=follower).
+Follow = User.followers.through
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+
+def get_timeout():
+    return getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 300)
+
+
+def cache_key(direction, user_id):
+    return f'follow:{direction}:{user_id}'
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def _load(direction, user_ids):
+    if direction == FOLLOWING:
+        owner, other = 'to_user_id', 'from_user_id'
+    else:
+        owner, other = 'from_user_id', 'to_user_id'
+    adjacency = {user_id: [] for user_id in user_ids}
+    rows = Follow.objects.filter(**{f'{owner}__in': user_ids}).values_list(owner, other)
+    for user_id, other_id in rows.iterator():
+        adjacency[user_id].append(other_id)
+    return {user_id: array('q', sorted(ids)) for user_id, ids in adjacency.items()}
+
+
+def get_many(direction, user_ids):
+    """
+    Return ``{user_id: sorted array of ids}`` for one direction of the graph,
+    loading every list missing from the cache with a single query.
+    """
+    keys = {cache_key(direction, user_id): user_id for user_id in user_ids}
+    result = {keys[key]: ids for key, ids in cache.get_many(keys).items()}
+    missing = [user_id for user_id in keys.values() if user_id not in result]
+    if missing:
+        loaded = _load(direction, missing)
+        cache.set_many({cache_key(direction, user_id): ids for user_id, ids in loaded.items()}, get_timeout())
+        result.update(loaded)
+    return result
+
+
+def get_following_ids(user_id):
+    return get_many(FOLLOWING, [user_id])[user_id]
+
+
+def get_follower_ids(user_id):
+    return get_many(FOLLOWERS, [user_id])[user_id]
+
+
+def is_following(user_id, target_id):
+    return _contains(get_following_ids(user_id), target_id)
+
+
+def is_mutual(user_id, other_id):
+    return is_following(user_id, other_id) and is_following(other_id, user_id)
+
+
+def mutual_ids(user_id):
+    """
+    Ids of the accounts that ``user_id`` follows and that follow them back, sorted.
+    """
+    followers = get_follower_ids(user_id)
+    return [other_id for other_id in get_following_ids(user_id) if _contains(followers, other_id)]
+
+
+def following_among(user_id, candidate_ids):
+    """
+    The subset of ``candidate_ids`` that ``user_id`` follows.
+    """
+    if not candidate_ids:
+        return set()
+    following = get_following_ids(user_id)
+    return {candidate_id for candidate_id in candidate_ids if _contains(following, candidate_id)}
+
+
+def stream_follower_ids(user_id, chunk_size=1000):
+    """
+    Iterate over the follower ids of ``user_id`` straight from the database.
+    """
+    rows = Follow.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True)
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def following_among_in_db(user_id, candidate_ids):
+    """
+    Like following_among, but read from the database.
+    """
+    if not candidate_ids:
+        return set()
+    return set(
+        Follow.objects.filter(to_user_id=user_id, from_user_id__in=candidate_ids)
+        .values_list('from_user_id', flat=True)
+    )
+
+
+def relationships(user_id, other_ids):
+    """
+    Return ``{other_id: (is_following, is_followed_by)}`` for rendering lists of profiles.
+    """
+    following = get_following_ids(user_id)
+    followers = get_follower_ids(user_id)
+    return {
+        other_id: (_contains(following, other_id), _contains(followers, other_id))
+        for other_id in other_ids
+    }
+
+
+def edges_changed(follower_id, followed_ids):
+    """
+    Drop the lists affected by ``follower_id`` following or unfollowing
+    ``followed_ids``. Call after the rows are written.
+    """
+    cache.delete_many([
+        cache_key(FOLLOWING, follower_id),
+        *(cache_key(FOLLOWERS, followed_id) for followed_id in followed_ids),
+    ])
+
+
+def invalidate(user_ids):
+    """
+    Drop both cached lists of the given users.
+    """
+    cache.delete_many([
+        cache_key(direction, user_id)
+        for user_id in user_ids
+        for direction in (FOLLOWING, FOLLOWERS)
+    ])
+
+
+def on_follows_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    ``m2m_changed`` receiver for edits made through ``user.followers`` or
+    ``user.following`` (admin, shell, fixtures) rather than the follow endpoints.
+    """
+    if action == 'pre_clear':
+        related = instance.following if reverse else instance.followers
+        invalidate(list(related.values_list('id', flat=True)))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate([instance.pk, *(pk_set or ())])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = "Precompute the \"who to follow\" suggestions of every user from the follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Users scored and written per batch.")
+        parser.add_argument('--top-k', type=int, default=None, help="Suggestions stored per user.")
+
+    def handle(self, *args, **options):
+        written = suggestions.compute_suggestions(chunk_size=options['chunk_size'], top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f"Computed suggestions for {written} user(s)."))
@@ -5,7 +5,24 @@ class User(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     followers = models.ManyToManyField('self', related_name='following', symmetrical=False, blank=True)
+    # Denormalized counters, maintained with F() updates (see posts.counters)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return self.username
-    
\ No newline at end of file
+    
+
+class FollowSuggestion(models.Model):
+    """
+    Precomputed "who to follow" list for one user, rebuilt by the
+    compute_suggestions command (see accounts.suggestions).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='follow_suggestion')
+    # [{"id": <user id>, "score": <float>, "mutual_count": <int>}, ...], best first
+    suggestions = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Suggestions for {self.user_id}"
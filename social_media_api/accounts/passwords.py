@@ -0,0 +1,115 @@
+"""
+Password checks for the login endpoint.
+
+When the hasher configuration changes (a new default in ``PASSWORD_HASHERS``
+or a higher work factor after a Django upgrade), Django re-hashes a user's
+password the next time it is checked and saves the user before the login
+returns. After a deploy that turns every login into two hash computations
+and a write. With ``PASSWORD_REHASH_DEFERRED`` on, the new hash is computed
+and stored by a background thread instead, so logins only pay for the check.
+
+The check itself runs on a pool of ``LOGIN_HASH_WORKERS`` threads that
+accepts at most ``LOGIN_HASH_MAX_PENDING`` checks at a time. A burst of login
+attempts therefore occupies a fixed number of cores; attempts beyond the
+limit fail fast with PasswordCheckBusy instead of queueing.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import close_old_connections
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+_rehash_executor = None
+_check_executor = None
+_check_slots = None
+_executor_lock = threading.Lock()
+
+
+class PasswordCheckBusy(Exception):
+    """
+    Raised when every password check slot is taken.
+    """
+
+
+def is_rehash_deferred():
+    return getattr(settings, 'PASSWORD_REHASH_DEFERRED', True)
+
+
+def get_hash_workers():
+    return getattr(settings, 'LOGIN_HASH_WORKERS', 2)
+
+
+def get_max_pending():
+    return getattr(settings, 'LOGIN_HASH_MAX_PENDING', 32)
+
+
+def _get_check_executor():
+    global _check_executor, _check_slots
+    with _executor_lock:
+        if _check_executor is None:
+            _check_executor = ThreadPoolExecutor(
+                max_workers=get_hash_workers(), thread_name_prefix='password-check'
+            )
+            _check_slots = threading.BoundedSemaphore(get_max_pending())
+        return _check_executor, _check_slots
+
+
+def _get_rehash_executor():
+    global _rehash_executor
+    with _executor_lock:
+        if _rehash_executor is None:
+            _rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='password-rehash')
+        return _rehash_executor
+
+
+def rehash(user_id, encoded, raw_password):
+    """
+    Store a fresh hash of ``raw_password`` unless the password changed since ``encoded`` was read.
+    Returns the new hash.
+    """
+    hashed = make_password(raw_password)
+    # update() rather than save(): the credentials did not change, so the
+    # user's cached tokens stay valid.
+    User.objects.filter(pk=user_id, password=encoded).update(password=hashed)
+    return hashed
+
+
+def _rehash_in_background(user_id, encoded, raw_password):
+    try:
+        rehash(user_id, encoded, raw_password)
+    except Exception:
+        logger.exception("Failed to rehash the password of user %s", user_id)
+    finally:
+        close_old_connections()
+
+
+def verify_password(user, raw_password):
+    """
+    Check ``raw_password`` against ``user``'s stored hash on the bounded
+    check pool, upgrading the hash if it is outdated. Raises PasswordCheckBusy
+    when the pool is saturated.
+    """
+    executor, slots = _get_check_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordCheckBusy()
+
+    encoded = user.password
+    outdated = []
+    try:
+        # check_password calls the setter only for a correct password with an outdated hash.
+        is_correct = executor.submit(check_password, raw_password, encoded, outdated.append).result()
+    finally:
+        slots.release()
+
+    if outdated:
+        if is_rehash_deferred():
+            _get_rehash_executor().submit(_rehash_in_background, user.pk, encoded, raw_password)
+        else:
+            user.password = rehash(user.pk, encoded, raw_password)
+    return is_correct
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from rest_framework.authtoken.models import Token
 from .models import User
+from . import follow_graph, passwords
 
 # This serializer is for user registration
 class UserSerializer(serializers.ModelSerializer):
@@ -24,38 +24,68 @@ class UserSerializer(serializers.ModelSerializer):
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
-    token = serializers.CharField(read_only=True)
 
     def validate(self, data):
         username = data.get('username')
         password = data.get('password')
 
-        if username and password:
-            try:
-                user = get_user_model().objects.get(username=username)
-                if not user.check_password(password):
-                    raise serializers.ValidationError("Incorrect password.")
-                
-                token, created = Token.objects.create(user=user)
-                data['token'] = token.key
-            except get_user_model().DoesNotExist:
-                raise serializers.ValidationError("User does not exist.")
-        else:
+        if not (username and password):
             raise serializers.ValidationError("Must include 'username' and 'password'.")
-        
+
+        # One query for the user; the token is issued by the view.
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            raise serializers.ValidationError("User does not exist.")
+        if not passwords.verify_password(user, password):
+            raise serializers.ValidationError("Incorrect password.")
+        if not user.is_active:
+            raise serializers.ValidationError("User account is disabled.")
+
+        data['user'] = user
         return data
 
+# This serializer is for bulk follow/unfollow requests
+class BulkFollowSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100
+    )
+
 # This serializer is for user profile
 class UserProfileSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    posts_count = serializers.SerializerMethodField()
+    # The counts are denormalized columns on User, so no aggregation is needed here.
+    # The relationship to the viewer comes from the cached follow graph.
+    is_following = serializers.SerializerMethodField()
+    follows_you = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['username', 'email', 'bio', 'profile_picture', 'followers_count', 'posts_count']
+        fields = [
+            'id', 'username', 'email', 'bio', 'profile_picture',
+            'followers_count', 'following_count', 'posts_count',
+            'is_following', 'follows_you',
+        ]
+        read_only_fields = ['followers_count', 'following_count', 'posts_count']
+
+    def _viewer_id(self):
+        request = self.context.get('request', None)
+        if request and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+    def get_is_following(self, obj):
+        viewer_id = self._viewer_id()
+        return viewer_id is not None and follow_graph.is_following(viewer_id, obj.pk)
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-    
-    def get_posts_count(self, obj):
-        return obj.posts.count()
\ No newline at end of file
+    def get_follows_you(self, obj):
+        viewer_id = self._viewer_id()
+        return viewer_id is not None and follow_graph.is_following(obj.pk, viewer_id)
+
+
+# This serializer is for "who to follow" suggestions
+class SuggestedUserSerializer(serializers.ModelSerializer):
+    mutual_count = serializers.IntegerField(read_only=True)
+    score = serializers.FloatField(source='suggestion_score', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'bio', 'profile_picture', 'followers_count', 'mutual_count', 'score']
@@ -0,0 +1,156 @@
+"""
+"Who to follow" suggestions.
+
+Suggestions are accounts followed by the accounts a user follows (second
+degree of the follow graph). Computing them per request would mean a
+self-join over the whole followers table, so they are precomputed by the
+``compute_suggestions`` management command, meant to run periodically, and
+stored as the top ``SUGGESTIONS_TOP_K`` entries per user in
+``FollowSuggestion``. Serving them is a primary key lookup.
+
+The batch reads the follow edges in chunks into compact per-user id arrays,
+then scores users in chunks of ``chunk_size``: candidate counts come from
+``Counter.update`` over the arrays of everyone the user follows, already
+followed accounts are removed with set operations, and the score adds a
+bonus for authors who posted recently.
+"""
+import heapq
+import math
+from array import array
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from . import follow_graph
+from .models import FollowSuggestion, User
+
+EDGE_CHUNK_SIZE = 10000
+
+
+def get_top_k():
+    return getattr(settings, 'SUGGESTIONS_TOP_K', 20)
+
+
+def get_activity_days():
+    return getattr(settings, 'SUGGESTIONS_ACTIVITY_DAYS', 7)
+
+
+def get_activity_weight():
+    return getattr(settings, 'SUGGESTIONS_ACTIVITY_WEIGHT', 0.5)
+
+
+def load_following():
+    """
+    Return ``{user_id: array of followed ids}`` for every user who follows someone.
+    """
+    following = {}
+    edges = follow_graph.Follow.objects.order_by().values_list('to_user_id', 'from_user_id')
+    for follower_id, followed_id in edges.iterator(chunk_size=EDGE_CHUNK_SIZE):
+        ids = following.get(follower_id)
+        if ids is None:
+            ids = following[follower_id] = array('q')
+        ids.append(followed_id)
+    return following
+
+
+def load_recent_activity():
+    """
+    Return ``{author_id: posts in the last SUGGESTIONS_ACTIVITY_DAYS days}``.
+    """
+    from posts.models import Post
+
+    since = timezone.now() - timedelta(days=get_activity_days())
+    return dict(
+        Post.objects.filter(created_at__gte=since)
+        .order_by()
+        .values('author_id')
+        .annotate(total=Count('*'))
+        .values_list('author_id', 'total')
+    )
+
+
+def score_user(user_id, following, activity, top_k, activity_weight):
+    """
+    Rank the second-degree candidates of one user. Returns the top ``top_k`` as dicts.
+    """
+    followed = following.get(user_id, ())
+    mutual_counts = Counter()
+    for followed_id in followed:
+        mutual_counts.update(following.get(followed_id, ()))
+
+    excluded = set(followed)
+    excluded.add(user_id)
+    candidates = mutual_counts.keys() - excluded
+
+    def score(candidate_id):
+        return mutual_counts[candidate_id] + activity_weight * math.log1p(activity.get(candidate_id, 0))
+
+    best = heapq.nlargest(top_k, candidates, key=lambda candidate_id: (score(candidate_id), -candidate_id))
+    return [
+        {
+            'id': candidate_id,
+            'score': round(score(candidate_id), 3),
+            'mutual_count': mutual_counts[candidate_id],
+        }
+        for candidate_id in best
+    ]
+
+
+def compute_suggestions(chunk_size=1000, top_k=None):
+    """
+    Recompute and store the suggestions of every user. Returns the number of users written.
+    """
+    top_k = top_k or get_top_k()
+    activity_weight = get_activity_weight()
+    started = timezone.now()
+    following = load_following()
+    activity = load_recent_activity()
+
+    user_ids = sorted(following)
+    for start in range(0, len(user_ids), chunk_size):
+        rows = [
+            FollowSuggestion(
+                user_id=user_id,
+                suggestions=score_user(user_id, following, activity, top_k, activity_weight),
+                computed_at=started,
+            )
+            for user_id in user_ids[start:start + chunk_size]
+        ]
+        FollowSuggestion.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['suggestions', 'computed_at'],
+        )
+
+    # Users who no longer follow anyone were not part of this run.
+    FollowSuggestion.objects.filter(computed_at__lt=started).delete()
+    return len(user_ids)
+
+
+def get_suggestions(user, limit=None):
+    """
+    Return the stored suggestions for ``user`` as User instances with
+    ``suggestion_score`` and ``mutual_count`` set, best first. Accounts the
+    user followed since the last batch run are left out.
+    """
+    stored = FollowSuggestion.objects.filter(user=user).values_list('suggestions', flat=True).first()
+    if not stored:
+        return []
+
+    already_following = follow_graph.following_among(user.pk, [entry['id'] for entry in stored])
+    entries = [entry for entry in stored if entry['id'] not in already_following][:limit]
+    users = User.objects.in_bulk([entry['id'] for entry in entries])
+
+    suggested = []
+    for entry in entries:
+        suggested_user = users.get(entry['id'])
+        if suggested_user is None:
+            continue
+        suggested_user.suggestion_score = entry['score']
+        suggested_user.mutual_count = entry['mutual_count']
+        suggested.append(suggested_user)
+    return suggested
@@ -1,3 +1,350 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from notifications.models import Notification
+from posts import counters
+from posts.models import Post, TimelineEntry
+from . import follow_graph
+from . import passwords
+from .authentication import token_cache
+from .models import FollowSuggestion, User
+from .throttling import get_backend
+
+
+class FollowGraphTestCase(APITestCase):
+    """Tests for the cached follow graph."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username="alice", password="testpass123")
+        self.bob = User.objects.create_user(username="bob", password="testpass123")
+        self.carol = User.objects.create_user(username="carol", password="testpass123")
+
+    def follow(self, user, target):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse("follow_user", kwargs={"user_id": target.pk}))
+
+    def unfollow(self, user, target):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse("unfollow_user", kwargs={"user_id": target.pk}))
+
+    def test_lookups_are_served_from_cache(self):
+        self.alice.following.add(self.bob, self.carol)
+        self.bob.following.add(self.alice)
+
+        self.assertEqual(list(follow_graph.get_following_ids(self.alice.pk)), sorted([self.bob.pk, self.carol.pk]))
+        follow_graph.get_follower_ids(self.alice.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.alice.pk, self.bob.pk))
+            self.assertEqual(follow_graph.mutual_ids(self.alice.pk), [self.bob.pk])
+            self.assertEqual(follow_graph.following_among(self.alice.pk, [self.bob.pk, 999]), {self.bob.pk})
+            self.assertEqual(
+                follow_graph.relationships(self.alice.pk, [self.bob.pk, self.carol.pk]),
+                {self.bob.pk: (True, True), self.carol.pk: (True, False)},
+            )
+
+    def test_follow_endpoints_keep_graph_current(self):
+        self.assertFalse(follow_graph.is_following(self.alice.pk, self.bob.pk))
+
+        self.follow(self.alice, self.bob)
+        self.assertTrue(follow_graph.is_following(self.alice.pk, self.bob.pk))
+        self.assertEqual(list(follow_graph.get_follower_ids(self.bob.pk)), [self.alice.pk])
+
+        self.unfollow(self.alice, self.bob)
+        self.assertFalse(follow_graph.is_following(self.alice.pk, self.bob.pk))
+        self.assertEqual(list(follow_graph.get_follower_ids(self.bob.pk)), [])
+
+    def test_repeated_follow_does_not_count_twice(self):
+        self.follow(self.alice, self.bob)
+        response = self.follow(self.alice, self.bob)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.followers_count, 1)
+
+    def test_writes_do_not_trust_a_stale_graph(self):
+        # Another process follows and unfollows while this one has the old lists cached.
+        follow_graph.get_following_ids(self.alice.pk)
+        follow_graph.Follow.objects.create(from_user=self.bob, to_user=self.alice)
+        counters.refresh_follow_counts([self.alice.pk, self.bob.pk])
+        self.unfollow(self.alice, self.bob)
+        self.assertFalse(self.alice.following.filter(pk=self.bob.pk).exists())
+
+        follow_graph.get_following_ids(self.alice.pk)
+        follow_graph.Follow.objects.all().delete()
+        counters.refresh_follow_counts([self.alice.pk, self.bob.pk])
+        self.follow(self.alice, self.bob)
+        self.assertTrue(self.alice.following.filter(pk=self.bob.pk).exists())
+        self.assertTrue(follow_graph.is_following(self.alice.pk, self.bob.pk))
+
+    def test_m2m_edits_invalidate(self):
+        self.assertFalse(follow_graph.is_following(self.alice.pk, self.bob.pk))
+        self.bob.followers.add(self.alice)
+        self.assertTrue(follow_graph.is_following(self.alice.pk, self.bob.pk))
+        self.alice.following.clear()
+        self.assertEqual(list(follow_graph.get_follower_ids(self.bob.pk)), [])
+
+    def test_profile_shows_relationship(self):
+        self.follow(self.bob, self.alice)
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(reverse("user_detail", kwargs={"pk": self.bob.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["is_following"])
+        self.assertTrue(response.data["follows_you"])
+        self.assertEqual(response.data["following_count"], 1)
+
+
+class BulkFollowTestCase(APITestCase):
+    """Tests for the bulk follow and unfollow endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="newcomer", password="testpass123")
+        self.suggested = [
+            User.objects.create_user(username=f"suggested{i}", password="testpass123") for i in range(5)
+        ]
+        self.ids = [user.pk for user in self.suggested]
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_follow(self):
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.ids[0]}))
+        post = Post.objects.create(author=self.suggested[1], content="hello")
+
+        response = self.client.post(
+            reverse("bulk_follow"), {"user_ids": [*self.ids, self.user.pk, 999]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["followed"], self.ids[1:])
+        self.assertEqual(response.data["already_following"], [self.ids[0]])
+        self.assertEqual(response.data["not_found"], [999])
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 5)
+        self.assertEqual(set(self.user.following.values_list("id", flat=True)), set(self.ids))
+        self.assertEqual(User.objects.get(pk=self.ids[1]).followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.user, post=post).exists())
+        self.assertEqual(Notification.objects.filter(verb="follow", actor=self.user).count(), 5)
+
+    def test_bulk_follow_query_count_is_constant(self):
+        follow_graph.get_following_ids(self.user.pk)
+        ContentType.objects.get_for_model(User)
+        # Lookup, savepoint, existing rows, insert, counter refresh, release, backfill,
+        # then unread notifications to merge into and one insert for the rest.
+        with self.assertNumQueries(9):
+            self.client.post(reverse("bulk_follow"), {"user_ids": self.ids}, format="json")
+
+    def test_bulk_unfollow(self):
+        self.client.post(reverse("bulk_follow"), {"user_ids": self.ids[:3]}, format="json")
+        response = self.client.post(reverse("bulk_unfollow"), {"user_ids": self.ids}, format="json")
+        self.assertEqual(response.data["unfollowed"], self.ids[:3])
+        self.assertEqual(response.data["not_following"], self.ids[3:])
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 0)
+        self.assertFalse(self.user.following.exists())
+        self.assertEqual(list(follow_graph.get_following_ids(self.user.pk)), [])
+
+    def test_bulk_unfollow_does_not_trust_a_stale_graph(self):
+        follow_graph.get_following_ids(self.user.pk)
+        follow_graph.Follow.objects.create(from_user=self.suggested[0], to_user=self.user)
+        response = self.client.post(reverse("bulk_unfollow"), {"user_ids": self.ids[:2]}, format="json")
+        self.assertEqual(response.data["unfollowed"], [self.ids[0]])
+        self.assertEqual(response.data["not_following"], [self.ids[1]])
+        self.assertFalse(self.user.following.exists())
+
+    def test_invalid_payload(self):
+        response = self.client.post(reverse("bulk_follow"), {"user_ids": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FollowSuggestionTestCase(APITestCase):
+    """Tests for the "who to follow" suggestions."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name, password="testpass123")
+            for name in ["me", "friend1", "friend2", "popular", "quiet", "followed"]
+        }
+        me, friend1, friend2 = self.users["me"], self.users["friend1"], self.users["friend2"]
+        me.following.add(friend1, friend2, self.users["followed"])
+        friend1.following.add(self.users["popular"], self.users["quiet"], self.users["followed"], me)
+        friend2.following.add(self.users["popular"])
+        Post.objects.create(author=self.users["quiet"], content="recent")
+        self.client.force_authenticate(me)
+
+    def test_ranks_second_degree_accounts(self):
+        out = StringIO()
+        call_command("compute_suggestions", stdout=out)
+        self.assertIn("Computed suggestions for 3 user(s).", out.getvalue())
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("follow_suggestions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user["username"] for user in response.data], ["popular", "quiet"])
+        self.assertEqual(response.data[0]["mutual_count"], 2)
+        self.assertGreater(response.data[1]["score"], 1)
+
+    def test_hides_accounts_followed_since_last_run(self):
+        call_command("compute_suggestions", stdout=StringIO())
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.users["popular"].pk}))
+        response = self.client.get(reverse("follow_suggestions"))
+        self.assertEqual([user["username"] for user in response.data], ["quiet"])
+
+    def test_stale_rows_are_removed(self):
+        call_command("compute_suggestions", stdout=StringIO())
+        self.users["friend2"].following.clear()
+        call_command("compute_suggestions", stdout=StringIO())
+        self.assertFalse(FollowSuggestion.objects.filter(user=self.users["friend2"]).exists())
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    """Tests for the cached token authentication."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear_local()
+        self.user = User.objects.create_user(username="reader", password="testpass123")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_repeat_requests_skip_token_lookup(self):
+        self.assertEqual(self.client.get(reverse("profile")).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("profile"))
+        self.assertEqual(response.data["username"], "reader")
+
+        # The shared tier still serves requests once the local entry is gone.
+        token_cache.clear_local()
+        with self.assertNumQueries(0):
+            self.client.get(reverse("profile"))
+
+    def test_logout_revokes_token(self):
+        self.client.get(reverse("profile"))
+        self.assertEqual(self.client.post(reverse("logout")).status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.client.get(reverse("profile")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_keeps_current_counters(self):
+        self.client.get(reverse("profile"))
+        fan = User.objects.create_user(username="fan", password="testpass123")
+        self.user.followers.add(fan)
+        counters.refresh_follow_counts([self.user.pk, fan.pk])
+
+        response = self.client.patch(reverse("profile"), {"bio": "hello"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.bio, self.user.followers_count), ("hello", 1))
+
+    @override_settings(FEED_CELEBRITY_FOLLOWER_THRESHOLD=1)
+    def test_post_fan_out_uses_current_follower_count(self):
+        self.client.get(reverse("profile"))
+        fan = User.objects.create_user(username="fan", password="testpass123")
+        self.user.followers.add(fan)
+        counters.refresh_follow_counts([self.user.pk, fan.pk])
+
+        response = self.client.post(reverse("post-list"), {"content": "celebrity post"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(TimelineEntry.objects.filter(post_id=response.data["id"]).exists())
+
+    def test_password_change_and_deactivation_invalidate(self):
+        self.client.get(reverse("profile"))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("profile")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        self.client.get(reverse("profile"))
+        self.user.set_password("new-password")
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+
+
+class LoginTestCase(APITestCase):
+    """Tests for the login endpoint."""
+
+    def setUp(self):
+        get_backend().clear()
+        self.user = User.objects.create_user(username="reader", password="testpass123")
+        self.credentials = {"username": "reader", "password": "testpass123"}
+
+    def test_repeat_logins_return_the_same_token(self):
+        first = self.client.post(reverse("login"), self.credentials)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(2):
+            second = self.client.post(reverse("login"), self.credentials)
+        self.assertEqual(second.data["token"], first.data["token"])
+        self.assertEqual(Token.objects.filter(user=self.user).count(), 1)
+
+    def test_invalid_credentials(self):
+        response = self.client.post(reverse("login"), {"username": "reader", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse("login"), {"username": "nobody", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Token.objects.exists())
+
+    @override_settings(PASSWORD_REHASH_DEFERRED=False, PASSWORD_HASHERS=[
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ])
+    def test_outdated_hash_is_upgraded(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password("testpass123", hasher="md5"))
+        response = self.client.post(reverse("login"), self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(self.user.check_password("testpass123"))
+
+
+class LoginRateLimitTestCase(APITestCase):
+    """Tests for login rate limiting and the password check pool."""
+
+    def setUp(self):
+        get_backend().clear()
+        User.objects.create_user(username="reader", password="testpass123")
+
+    def login(self, username="reader", password="wrong", ip="10.0.0.1"):
+        return self.client.post(
+            reverse("login"), {"username": username, "password": password}, REMOTE_ADDR=ip
+        )
+
+    def test_limits_attempts_per_username(self):
+        rates = {"login_ip": "100/min", "login_username": "3/min"}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            for i in range(3):
+                self.assertEqual(self.login(ip=f"10.0.0.{i}").status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.login(username="Reader", ip="10.0.0.9")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn("Retry-After", response)
+            self.assertEqual(self.login(username="someone-else").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limits_attempts_per_ip(self):
+        rates = {"login_ip": "2/min", "login_username": "100/min"}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.login(username="a")
+            self.login(username="b")
+            self.assertEqual(self.login(username="c").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.login(username="c", ip="10.0.0.2").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_saturated_check_pool_fails_fast(self):
+        _, slots = passwords._get_check_executor()
+        acquired = 0
+        while slots.acquire(blocking=False):
+            acquired += 1
+        try:
+            response = self.login(password="testpass123")
+        finally:
+            for _ in range(acquired):
+                slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.login(password="testpass123").status_code, status.HTTP_200_OK)
@@ -0,0 +1,103 @@
+"""
+Sliding-window rate limits for the login endpoint.
+
+Login attempts are limited per client IP (scope ``login_ip``) and per
+submitted username (scope ``login_username``), with the rates taken from
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``. Both keep a log of attempt
+timestamps per key, as DRF's SimpleRateThrottle does, in the backend named by
+``LOGIN_THROTTLE_BACKEND``:
+
+* ``accounts.throttling.InMemoryHistory`` (default) keeps the logs in process
+  memory, so rejected attempts cost no I/O. Each process counts separately.
+* ``accounts.throttling.SharedCacheHistory`` keeps them in Django's default
+  cache, so the limits hold across processes when that cache is shared.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class InMemoryHistory:
+    """
+    Bounded in-process store with the ``get``/``set`` interface SimpleRateThrottle expects.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            return list(value)
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, list(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCacheHistory:
+    def get(self, key, default=None):
+        return cache.get(key, default)
+
+    def set(self, key, value, timeout):
+        cache.set(key, value, timeout)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'LOGIN_THROTTLE_BACKEND', 'accounts.throttling.InMemoryHistory')
+    return import_string(path)()
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    @property
+    def cache(self):
+        return get_backend()
+
+    def get_rate(self):
+        # Read at request time rather than import time, so setting overrides apply.
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+
+class LoginIPRateThrottle(LoginRateThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginUsernameRateThrottle(LoginRateThrottle):
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        # Usernames are user input; hash them into a key that is safe for any cache backend.
+        ident = hashlib.sha256(username.strip().lower().encode('utf-8')).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,10 +1,26 @@
 from django.urls import path
-from .views import RegisterView, LoginView, UserProfileView, follow_user, unfollow_user
+from .views import (
+    RegisterView,
+    LoginView,
+    LogoutView,
+    UserProfileView,
+    UserDetailView,
+    FollowSuggestionsView,
+    follow_user,
+    unfollow_user,
+    bulk_follow,
+    bulk_unfollow,
+)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', UserProfileView.as_view(), name='profile'),
+    path('users/<int:pk>/', UserDetailView.as_view(), name='user_detail'),
+    path('suggestions/', FollowSuggestionsView.as_view(), name='follow_suggestions'),
+    path('follow/bulk/', bulk_follow, name='bulk_follow'),
+    path('unfollow/bulk/', bulk_unfollow, name='bulk_unfollow'),
     path('follow/<int:user_id>/', follow_user, name='follow_user'),
     path('unfollow/<int:user_id>/', unfollow_user, name='unfollow_user'),
 ]
\ No newline at end of file
@@ -5,10 +5,22 @@ from rest_framework.authtoken.models import Token
 from rest_framework import permissions
 from rest_framework.permissions import IsAuthenticated
 from .models import User
-from .serializers import UserSerializer, LoginSerializer
+from .serializers import (
+    UserSerializer,
+    LoginSerializer,
+    UserProfileSerializer,
+    BulkFollowSerializer,
+    SuggestedUserSerializer,
+)
 from rest_framework.decorators import api_view, permission_classes
 from django.shortcuts import get_object_or_404
 from .models import User as CustomUser
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from notifications.dispatch import dispatcher, notify
+from posts import counters, feed_cache, timeline
+from . import follow_graph, passwords, suggestions
+from .throttling import LoginIPRateThrottle, LoginUsernameRateThrottle
 
 
 class RegisterView(generics.CreateAPIView):
@@ -16,21 +28,67 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 class LoginView(APIView):
+    throttle_classes = [LoginIPRateThrottle, LoginUsernameRateThrottle]
+
     def post(self, request, *args, **kwargs):
         serializer = LoginSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data
-        token, created = Token.objects.get_or_create(user=user)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except passwords.PasswordCheckBusy:
+            return Response(
+                {"error": "Too many login attempts in progress. Try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'},
+            )
+        user = serializer.validated_data['user']
+        # Repeat logins reuse the user's existing token.
+        token, _ = Token.objects.get_or_create(user=user)
         return Response({'token': token.key, 'user_id': user.pk})
 
+class LogoutView(APIView):
+    """
+    Delete the token used for this request, which also drops it from the auth cache.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if isinstance(request.auth, Token):
+            request.auth.delete()
+        return Response({'message': 'Logged out.'}, status=status.HTTP_200_OK)
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
-    
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # request.user may come from the token cache with outdated counters,
+        # and saving it writes every column; update the current row instead.
+        return User.objects.get(pk=self.request.user.pk)
+
+
+class UserDetailView(generics.RetrieveAPIView):
+    """
+    Public profile of another user, with the follow relationship to the viewer.
+    """
+    queryset = User.objects.all()
+    serializer_class = UserProfileSerializer
+    permission_classes = [IsAuthenticated]
+
+
+class FollowSuggestionsView(generics.ListAPIView):
+    """
+    "Who to follow" list for the current user, precomputed by compute_suggestions.
+    """
+    serializer_class = SuggestedUserSerializer
+    permission_classes = [IsAuthenticated]
+    # At most SUGGESTIONS_TOP_K entries, so the list is returned whole.
+    pagination_class = None
+
+    def get_queryset(self):
+        return suggestions.get_suggestions(self.request.user)
 
 
 class FollowAPIView(generics.GenericAPIView):
@@ -42,29 +100,131 @@ class FollowAPIView(generics.GenericAPIView):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def follow_user(request, user_id):
-    target_user_qs = CustomUser.objects.filter(id=user_id)
-    if not target_user_qs.exists():
+    target_user = CustomUser.objects.filter(id=user_id).first()
+    if target_user is None:
         return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-    target_user = target_user_qs.first()
     current_user = request.user
     
     if current_user == target_user:
         return Response({"error": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
-    
-    current_user.following.add(target_user)
+
+    # Write the through row directly so we know whether the follow is new
+    # and the counters only move once. The database decides, not the cached
+    # graph, which may not have seen another process's write yet.
+    with transaction.atomic():
+        _, created = counters.Follow.objects.get_or_create(from_user=target_user, to_user=current_user)
+        if created:
+            counters.adjust(CustomUser, target_user.pk, followers_count=1)
+            counters.adjust(CustomUser, current_user.pk, following_count=1)
+    # Also when nothing changed: the cached graph evidently disagreed.
+    follow_graph.edges_changed(current_user.pk, [target_user.pk])
+    if created:
+        timeline.backfill_author(current_user, target_user)
+        feed_cache.invalidate([current_user.pk])
+        notify(target_user, current_user, 'follow', target_user)
     return Response({"message": f"You are now following {target_user.username}"}, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def unfollow_user(request, user_id):
-    target_user_qs = CustomUser.objects.filter(id=user_id)
-    if not target_user_qs.exists():
+    target_user = CustomUser.objects.filter(id=user_id).first()
+    if target_user is None:
         return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-    target_user = target_user_qs.first()
     current_user = request.user
     
     if current_user == target_user:
         return Response({"error": "You cannot unfollow yourself."}, status=status.HTTP_400_BAD_REQUEST)
-    
-    current_user.following.remove(target_user)
-    return Response({"message": f"You have unfollowed {target_user.username}"}, status=status.HTTP_200_OK)
\ No newline at end of file
+
+    with transaction.atomic():
+        deleted, _ = counters.Follow.objects.filter(from_user=target_user, to_user=current_user).delete()
+        if deleted:
+            counters.adjust(CustomUser, target_user.pk, followers_count=-1)
+            counters.adjust(CustomUser, current_user.pk, following_count=-1)
+    follow_graph.edges_changed(current_user.pk, [target_user.pk])
+    if deleted:
+        timeline.remove_author(current_user, target_user)
+        feed_cache.invalidate([current_user.pk])
+    return Response({"message": f"You have unfollowed {target_user.username}"}, status=status.HTTP_200_OK)
+
+
+def _bulk_targets(request):
+    serializer = BulkFollowSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    # Keep the request order, drop duplicates and the caller's own id.
+    requested = [
+        user_id for user_id in dict.fromkeys(serializer.validated_data['user_ids'])
+        if user_id != request.user.pk
+    ]
+    targets = CustomUser.objects.filter(pk__in=requested).only('id', 'username', 'followers_count')
+    return requested, list(targets)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_follow(request):
+    """
+    Follow every user in ``user_ids`` with one lookup and one insert.
+    """
+    requested, targets = _bulk_targets(request)
+    current_user = request.user
+    found = {target.pk for target in targets}
+
+    # Existing rows come from the database: the cached graph may be behind other processes' writes.
+    with transaction.atomic():
+        already_following = set(
+            counters.Follow.objects.filter(to_user_id=current_user.pk, from_user_id__in=found)
+            .values_list('from_user_id', flat=True)
+        )
+        new_targets = [target for target in targets if target.pk not in already_following]
+        new_ids = [target.pk for target in new_targets]
+        if new_ids:
+            counters.Follow.objects.bulk_create(
+                [counters.Follow(from_user_id=target_id, to_user_id=current_user.pk) for target_id in new_ids],
+                ignore_conflicts=True,
+            )
+            counters.refresh_follow_counts([current_user.pk, *new_ids])
+    follow_graph.edges_changed(current_user.pk, found)
+
+    if new_targets:
+        timeline.backfill_authors(current_user, new_targets)
+        feed_cache.invalidate([current_user.pk])
+        content_type_id = ContentType.objects.get_for_model(CustomUser).pk
+        dispatcher.enqueue_many(
+            (target_id, current_user.pk, 'follow', content_type_id, target_id) for target_id in new_ids
+        )
+
+    return Response({
+        "followed": [target.pk for target in new_targets],
+        "already_following": sorted(already_following),
+        "not_found": [user_id for user_id in requested if user_id not in found],
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_unfollow(request):
+    """
+    Unfollow every user in ``user_ids`` with one lookup and one delete.
+    """
+    requested, targets = _bulk_targets(request)
+    current_user = request.user
+    found = {target.pk for target in targets}
+
+    # Which rows exist is read from the database, not the cached graph.
+    with transaction.atomic():
+        rows = counters.Follow.objects.filter(to_user_id=current_user.pk, from_user_id__in=found)
+        unfollowed = sorted(rows.values_list('from_user_id', flat=True))
+        if unfollowed:
+            rows.delete()
+            counters.refresh_follow_counts([current_user.pk, *unfollowed])
+    follow_graph.edges_changed(current_user.pk, found)
+
+    if unfollowed:
+        timeline.remove_authors(current_user, unfollowed)
+        feed_cache.invalidate([current_user.pk])
+
+    return Response({
+        "unfollowed": unfollowed,
+        "not_following": sorted(found.difference(unfollowed)),
+        "not_found": [user_id for user_id in requested if user_id not in found],
+    }, status=status.HTTP_200_OK)
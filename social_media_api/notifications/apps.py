@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
+
+    def ready(self):
+        from posts.like_buffer import like_buffer
+        from . import unread
+        from .broker import publish_notifications
+        from .dispatch import dispatcher, notify_buffered_likes
+
+        like_buffer.connect(notify_buffered_likes)
+        dispatcher.connect(unread.on_notifications_created)
+        dispatcher.connect(publish_notifications)
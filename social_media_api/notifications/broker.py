@@ -0,0 +1,130 @@
+"""
+Pub/sub for pushing new notifications to connected clients.
+
+The broker class is configured with ``NOTIFICATIONS_BROKER``. The default
+``InProcessBroker`` delivers messages to subscribers in the same process,
+which is all a single ASGI worker (and the test suite) needs. A shared
+backend, e.g. one built on Redis pub/sub, can be plugged in by implementing
+``publish`` and ``subscribe`` with the same signatures.
+"""
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    def publish(self, user_id, message):
+        """
+        Deliver ``message`` to every subscriber of ``user_id``. Must be safe to call from any thread.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """
+        Return a Subscription for ``user_id``. Must be called from the event loop that will read it.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    """
+    Queue of messages for one connected client.
+    """
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self, timeout=None):
+        """
+        Wait for the next message; return None if ``timeout`` seconds pass first.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.put(message)
+            except RuntimeError:
+                # The subscriber's event loop has already been closed.
+                subscription.close()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscriber_count(self, user_id):
+        with self._lock:
+            return len(self._subscriptions.get(user_id, ()))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, 'NOTIFICATIONS_BROKER', 'notifications.broker.InProcessBroker')
+    return import_string(path)()
+
+
+def notification_message(notification):
+    """
+    Compact payload pushed to clients; full details come from the list endpoint.
+    """
+    return {
+        'id': notification.pk,
+        'actor': notification.actor_id,
+        'actor_count': notification.actor_count,
+        'verb': notification.verb,
+        'content_type': notification.content_type_id,
+        'object_id': notification.object_id,
+        'read': notification.read,
+        'timestamp': notification.timestamp.isoformat(),
+    }
+
+
+def publish_notifications(created, merged):
+    """
+    Dispatcher listener: push new and updated notifications to their recipients.
+    """
+    broker = get_broker()
+    for notification in [*created, *merged]:
+        broker.publish(notification.recipient_id, notification_message(notification))
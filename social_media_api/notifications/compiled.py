@@ -0,0 +1,79 @@
+"""
+Compiled, read-only serialization of notification pages (see posts.compiled).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+
+from posts.compiled import (
+    AuthorRowSerializer,
+    CommentRowSerializer,
+    CompiledSerializer,
+    PostSummaryRowSerializer,
+    datetime_formatter,
+    file_url_formatter,
+)
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class NotificationRowSerializer(CompiledSerializer):
+    """
+    Stands in for NotificationSerializer. Targets are loaded with one
+    ``.values()`` query per content type on the page.
+    """
+    values = (
+        'id', 'recipient_id', 'actor_id', 'actor__username', 'actor__email', 'actor__bio',
+        'actor__profile_picture', 'actor_count', 'verb', 'content_type_id', 'object_id',
+        'read', 'timestamp',
+    )
+
+    # Compiled serializer used for each kind of target object
+    target_serializers = {
+        Post: PostSummaryRowSerializer,
+        Comment: CommentRowSerializer,
+        User: AuthorRowSerializer,
+    }
+
+    def load_targets(self, rows):
+        object_ids = {}
+        for row in rows:
+            object_ids.setdefault(row['content_type_id'], set()).add(row['object_id'])
+
+        targets = {}
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            serializer_class = self.target_serializers.get(model)
+            if serializer_class is None:
+                continue
+            serialized = serializer_class(self.context).serialize_by_pk(model._default_manager.filter(pk__in=ids))
+            for pk, data in serialized.items():
+                targets[content_type_id, pk] = data
+        return targets
+
+    def compile(self, rows):
+        targets = self.load_targets(rows)
+        format_datetime = datetime_formatter()
+        format_picture = file_url_formatter(
+            User._meta.get_field('profile_picture'), self.context.get('request', None)
+        )
+
+        def to_representation(row):
+            return {
+                'id': row['id'],
+                'recipient': row['recipient_id'],
+                'actor': {
+                    'id': row['actor_id'],
+                    'username': row['actor__username'],
+                    'email': row['actor__email'],
+                    'bio': row['actor__bio'],
+                    'profile_picture': format_picture(row['actor__profile_picture']),
+                },
+                'actor_count': row['actor_count'],
+                'verb': row['verb'],
+                'target': targets.get((row['content_type_id'], row['object_id'])),
+                'read': row['read'],
+                'timestamp': format_datetime(row['timestamp']),
+            }
+
+        return to_representation
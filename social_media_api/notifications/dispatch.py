@@ -0,0 +1,261 @@
+"""
+Asynchronous notification dispatch.
+
+Interaction endpoints call ``notify()``, which only puts an event on an
+in-process queue. A collector thread drains the queue every
+``NOTIFICATIONS_FLUSH_INTERVAL`` seconds, coalesces events that share a
+recipient, verb and target into one row ("12 people liked your post") and
+hands the rows to a small thread pool that writes them. A row whose recipient
+still has an unread notification for the same verb and target is folded into
+that notification, which gets the new actor, a higher ``actor_count`` and a
+fresh timestamp; the rest are inserted with ``bulk_create``.
+"""
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = 500
+
+
+class NotificationDispatcher:
+    """
+    Queues notification events and writes them in coalesced batches off the request thread.
+    """
+
+    def __init__(self, flush_interval=None, workers=None):
+        self.flush_interval = flush_interval
+        self.workers = workers
+        self._events = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._collector = None
+        self._executor = None
+        self._listeners = []
+
+    def get_flush_interval(self):
+        if self.flush_interval is not None:
+            return self.flush_interval
+        return getattr(settings, 'NOTIFICATIONS_FLUSH_INTERVAL', 1.0)
+
+    def is_async(self):
+        return getattr(settings, 'NOTIFICATIONS_ASYNC', True)
+
+    def get_workers(self):
+        if self.workers is not None:
+            return self.workers
+        return getattr(settings, 'NOTIFICATIONS_WORKERS', 2)
+
+    def connect(self, listener):
+        """
+        Register ``listener(created, merged)``, called after each batch with the
+        inserted rows and the unread rows that new events were folded into.
+        """
+        self._listeners.append(listener)
+
+    def enqueue(self, recipient_id, actor_id, verb, content_type_id, object_id):
+        self.enqueue_many([(recipient_id, actor_id, verb, content_type_id, object_id)])
+
+    def enqueue_many(self, events):
+        """
+        Queue (recipient_id, actor_id, verb, content_type_id, object_id) events.
+        """
+        for event in events:
+            # Nobody is notified about their own actions.
+            if event[0] != event[1]:
+                self._events.put(event)
+        if self.is_async():
+            self._ensure_collector()
+        else:
+            self.flush()
+
+    def drain(self):
+        """
+        Take every queued event and coalesce them into unsaved Notification rows.
+        """
+        groups = {}
+        while True:
+            try:
+                recipient_id, actor_id, verb, content_type_id, object_id = self._events.get_nowait()
+            except queue.Empty:
+                break
+            key = (recipient_id, verb, content_type_id, object_id)
+            actors = groups.setdefault(key, {})
+            # Re-inserting moves the actor to the end, so the last one is the most recent.
+            actors.pop(actor_id, None)
+            actors[actor_id] = True
+
+        return [
+            Notification(
+                recipient_id=recipient_id,
+                actor_id=next(reversed(actors)),
+                actor_count=len(actors),
+                verb=verb,
+                content_type_id=content_type_id,
+                object_id=object_id,
+            )
+            for (recipient_id, verb, content_type_id, object_id), actors in groups.items()
+        ]
+
+    def merge_unread(self, notifications):
+        """
+        Fold ``notifications`` into their recipients' unread notifications for
+        the same verb and target. Returns (unmatched, merged).
+        """
+        recipients_by_target = {}
+        for n in notifications:
+            recipients_by_target.setdefault((n.verb, n.content_type_id, n.object_id), []).append(n.recipient_id)
+        condition = reduce(or_, (
+            Q(verb=verb, content_type_id=content_type_id, object_id=object_id, recipient_id__in=recipient_ids)
+            for (verb, content_type_id, object_id), recipient_ids in recipients_by_target.items()
+        ))
+        # Oldest first, so the newest of several unread duplicates wins.
+        unread = {
+            (row.recipient_id, row.verb, row.content_type_id, row.object_id): row
+            for row in Notification.objects.filter(condition, read=False).order_by('timestamp', 'pk')
+        }
+
+        unmatched, merged, added = [], [], {}
+        now = timezone.now()
+        for n in notifications:
+            row = unread.get((n.recipient_id, n.verb, n.content_type_id, n.object_id))
+            if row is None:
+                unmatched.append(n)
+                continue
+            row.actor_id = n.actor_id
+            row.timestamp = now
+            added[row.pk] = n.actor_count
+            merged.append(row)
+        if merged:
+            # An expression, so that concurrent writers add up instead of overwriting each other.
+            for row in merged:
+                row.actor_count = F('actor_count') + added[row.pk]
+            Notification.objects.bulk_update(merged, ['actor', 'actor_count', 'timestamp'])
+            counts = dict(
+                Notification.objects.filter(pk__in=added).values_list('pk', 'actor_count')
+            )
+            for row in merged:
+                row.actor_count = counts[row.pk]
+        return unmatched, merged
+
+    def write(self, notifications):
+        created, merged = [], []
+        for start in range(0, len(notifications), WRITE_BATCH_SIZE):
+            unmatched, batch_merged = self.merge_unread(notifications[start:start + WRITE_BATCH_SIZE])
+            created += Notification.objects.bulk_create(unmatched)
+            merged += batch_merged
+        for listener in self._listeners:
+            listener(created, merged)
+        return created + merged
+
+    def flush(self):
+        """
+        Synchronously write everything that is queued. Returns the created and merged rows.
+        """
+        notifications = self.drain()
+        if not notifications:
+            return []
+        return self.write(notifications)
+
+    def _write_in_worker(self, notifications):
+        try:
+            self.write(notifications)
+        except Exception:
+            logger.exception("Failed to write %d notification(s)", len(notifications))
+        finally:
+            close_old_connections()
+
+    def _ensure_collector(self):
+        if self._collector is not None and self._collector.is_alive():
+            return
+        with self._lock:
+            if self._collector is not None and self._collector.is_alive():
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.get_workers(), thread_name_prefix='notifications'
+                )
+            self._collector = threading.Thread(target=self._run, name='notification-collector', daemon=True)
+            self._collector.start()
+
+    def _run(self):
+        while not self._wakeup.wait(self.get_flush_interval()):
+            notifications = self.drain()
+            for start in range(0, len(notifications), WRITE_BATCH_SIZE):
+                self._executor.submit(self._write_in_worker, notifications[start:start + WRITE_BATCH_SIZE])
+
+    def is_running(self):
+        return self._collector is not None
+
+    def stop(self):
+        self._wakeup.set()
+        if self._collector is not None:
+            self._collector.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._collector = None
+        self._executor = None
+        self._wakeup.clear()
+        self.flush()
+
+
+dispatcher = NotificationDispatcher()
+
+
+def notify(recipient, actor, verb, target):
+    """
+    Queue a notification for ``recipient`` about ``actor`` doing ``verb`` on ``target``.
+    ``recipient`` and ``actor`` may be users or user ids.
+    """
+    dispatcher.enqueue(
+        getattr(recipient, 'pk', recipient),
+        getattr(actor, 'pk', actor),
+        verb,
+        ContentType.objects.get_for_model(target).pk,
+        target.pk,
+    )
+
+
+def notify_buffered_likes(liked, unliked):
+    """
+    Like buffer listener: queue 'like' notifications for likes written by a flush.
+    """
+    from posts.models import Post
+
+    if not liked:
+        return
+    authors = dict(
+        Post.objects.filter(pk__in={post_id for _, post_id in liked}).values_list('pk', 'author_id')
+    )
+    content_type_id = ContentType.objects.get_for_model(Post).pk
+    dispatcher.enqueue_many(
+        (authors[post_id], user_id, 'like', content_type_id, post_id)
+        for user_id, post_id in liked
+        if post_id in authors
+    )
+
+
+@atexit.register
+def _flush_on_exit():
+    # Synchronous dispatch leaves nothing queued, and by exit time the database
+    # may no longer be the one the events were meant for (the test runner has
+    # dropped its database by then).
+    if not dispatcher.is_running():
+        return
+    try:
+        dispatcher.stop()
+    except Exception:
+        logger.exception("Failed to flush queued notifications on exit")
@@ -1,7 +1,27 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+
+
+class NotificationQuerySet(models.QuerySet):
+    def with_targets(self):
+        """
+        Load actors and content types with a join, and the generic targets with
+        one query per content type for the whole page instead of one per row.
+        """
+        from posts.models import Comment, Post
+
+        return self.select_related('actor', 'content_type').prefetch_related(
+            GenericPrefetch('target', [
+                Post.objects.all(),
+                Comment.objects.select_related('author'),
+                get_user_model().objects.all(),
+            ])
+        )
+
 
 class Notification(models.Model):
     """
@@ -15,6 +35,8 @@ class Notification(models.Model):
 
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='acting_notifications')
+    # Number of distinct users coalesced into this notification; actor is the most recent one.
+    actor_count = models.PositiveIntegerField(default=1)
     verb = models.CharField(max_length=20)
     read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -24,8 +46,12 @@ class Notification(models.Model):
     object_id = models.PositiveIntegerField()
     target = GenericForeignKey('content_type', 'object_id')
 
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-timestamp']
 
     def __str__(self):
-        return f'{self.actor.username} {self.verb} {self.target.__class__.__name__} for {self.recipient.username}'
+        # ContentType lookups by id are cached, so this does not load the target.
+        model = ContentType.objects.get_for_id(self.content_type_id).model
+        return f'{self.actor.username} {self.verb} {model} for {self.recipient.username}'
@@ -1,23 +1,37 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import Notification
-from accounts.serializers import UserSerializer 
-from posts.serializers import PostSerializer  
+from accounts.serializers import UserSerializer
+from posts.models import Comment, Post
+from posts.serializers import AuthorSerializer, CommentSerializer, PostSerializer
+
 
 class NotificationSerializer(serializers.ModelSerializer):
+    """
+    Serializes a notification with its actor and target.
+    Use Notification.objects.with_targets() so that actors and targets are
+    already loaded when a page of notifications is serialized.
+    """
     actor = UserSerializer(read_only=True)
     target = serializers.SerializerMethodField()
 
+    # Serializer used for each kind of target object
+    target_serializers = {
+        Post: PostSerializer,
+        Comment: CommentSerializer,
+        get_user_model(): AuthorSerializer,
+    }
+
     class Meta:
         model = Notification
-        fields = ['id', 'recipient', 'actor', 'verb', 'target', 'read', 'timestamp']
-        read_only_fields = ['id', 'recipient', 'actor', 'verb', 'target', 'timestamp']
+        fields = ['id', 'recipient', 'actor', 'actor_count', 'verb', 'target', 'read', 'timestamp']
+        read_only_fields = ['id', 'recipient', 'actor', 'actor_count', 'verb', 'target', 'timestamp']
 
     def get_target(self, obj):
-        if obj.target:
-            if isinstance(obj.target, obj.target.__class__):
-                if obj.content_type.model == 'post':
-                    return PostSerializer(obj.target).data
-                # Add other cases for other models (e.g., 'comment') as needed
-                # elif obj.content_type.model == 'comment':
-                #     return CommentSerializer(obj.target).data
-        return None
\ No newline at end of file
+        target = obj.target
+        if target is None:
+            return None
+        serializer_class = self.target_serializers.get(type(target))
+        if serializer_class is None:
+            return None
+        return serializer_class(target, context=self.context).data
@@ -1,3 +1,208 @@
-from django.test import TestCase
+import asyncio
+import time
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from posts.models import Comment, Post
+from .broker import get_broker
+from .dispatch import dispatcher, notify
+from .models import Notification
+from .serializers import NotificationSerializer
+
+User = get_user_model()
+
+
+class NotificationDispatchTestCase(APITestCase):
+    """Tests for the notification dispatch pipeline."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="testpass123") for i in range(3)]
+        self.post = Post.objects.create(author=self.author, content="popular")
+
+    def test_interactions_create_notifications(self):
+        self.client.force_authenticate(self.fans[0])
+        self.client.post(reverse("like_post", kwargs={"pk": self.post.pk}))
+        self.client.post(reverse("comment-list"), {"post": self.post.pk, "content": "hi"})
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.pk}))
+
+        self.assertEqual(
+            sorted(Notification.objects.filter(recipient=self.author).values_list("verb", flat=True)),
+            ["comment", "follow", "like"],
+        )
+
+    def test_own_actions_are_not_notified(self):
+        self.client.force_authenticate(self.author)
+        self.client.post(reverse("like_post", kwargs={"pk": self.post.pk}))
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(NOTIFICATIONS_ASYNC=True, NOTIFICATIONS_FLUSH_INTERVAL=3600)
+    def test_events_are_coalesced_per_target(self):
+        self.addCleanup(dispatcher.stop)
+        for fan in self.fans + [self.fans[0]]:
+            notify(self.author, fan, "like", self.post)
+        notify(self.author, self.fans[1], "follow", self.author)
+        self.assertFalse(Notification.objects.exists())
+
+        # Unread notifications to merge into, then one bulk insert.
+        with self.assertNumQueries(2):
+            created = dispatcher.flush()
+
+        self.assertEqual(len(created), 2)
+        like = Notification.objects.get(verb="like")
+        self.assertEqual(like.actor_count, 3)
+        self.assertEqual(like.actor, self.fans[0])
+        self.assertEqual(Notification.objects.get(verb="follow").actor_count, 1)
+
+    def test_events_merge_into_unread_notification_across_flushes(self):
+        notify(self.author, self.fans[0], "like", self.post)
+        like = Notification.objects.get(verb="like")
+
+        notify(self.author, self.fans[1], "like", self.post)
+        notify(self.author, self.fans[2], "like", self.post)
+        like.refresh_from_db()
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual((like.actor_count, like.actor), (3, self.fans[2]))
+
+        # Once read, the next like starts a new notification.
+        Notification.objects.update(read=True)
+        notify(self.author, self.fans[0], "like", self.post)
+        self.assertEqual(Notification.objects.filter(read=False).get().actor_count, 1)
+
+
+class NotificationListQueryTestCase(APITestCase):
+    """The notification list must not issue queries per row."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        fans = [User.objects.create_user(username=f"fan{i}", password="testpass123") for i in range(5)]
+        for i, fan in enumerate(fans):
+            post = Post.objects.create(author=self.author, content=f"post {i}")
+            comment = Comment.objects.create(author=fan, post=post, content="nice")
+            notify(self.author, fan, "like", post)
+            notify(self.author, fan, "comment", comment)
+            notify(self.author, fan, "follow", self.author)
+        self.client.force_authenticate(self.author)
+
+    def test_page_queries_are_constant(self):
+        # Count, notifications with actors, then one query per target type.
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("notification_list"))
+
+        results = response.data["results"]
+        self.assertEqual(len(results), 10)
+        for notification in results:
+            target = notification["target"]
+            if notification["verb"] == "comment":
+                self.assertEqual(target["author"]["username"], notification["actor"]["username"])
+            elif notification["verb"] == "like":
+                self.assertTrue(target["content"].startswith("post"))
+            else:
+                self.assertEqual(target["username"], "author")
+
+    def test_matches_model_serializer(self):
+        response = self.client.get(reverse("notification_list"), {"page_size": 20})
+        request = response.wsgi_request
+        expected = NotificationSerializer(
+            Notification.objects.filter(recipient=self.author).with_targets().order_by("-timestamp")[:10],
+            many=True,
+            context={"request": request},
+        ).data
+        self.assertEqual(response.data["results"], expected)
+
+
+class UnreadCountTestCase(APITestCase):
+    """Tests for the cached unread counter."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="testpass123") for i in range(3)]
+        self.client.force_authenticate(self.author)
+
+    def unread_count(self):
+        return self.client.get(reverse("notification_unread_count")).data["unread_count"]
+
+    def test_counter_tracks_create_and_read(self):
+        self.assertEqual(self.unread_count(), 0)
+        for fan in self.fans:
+            notify(self.author, fan, "follow", fan)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 3)
+
+        notification = Notification.objects.first()
+        url = reverse("notification_read", kwargs={"pk": notification.pk})
+        self.client.put(url)
+        self.client.put(url)
+        self.assertEqual(self.unread_count(), 2)
+
+        response = self.client.post(reverse("notification_read_all"))
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.filter(read=False).exists())
+
+    @override_settings(NOTIFICATIONS_UNREAD_CACHE_TIMEOUT=1)
+    def test_counter_is_reseeded_after_timeout(self):
+        self.assertEqual(self.unread_count(), 0)
+        # Written by another process, whose increment this cache never saw.
+        Notification.objects.create(recipient=self.author, actor=self.fans[0], verb="follow", target=self.fans[0])
+        self.assertEqual(self.unread_count(), 0)
+
+        time.sleep(1.1)
+        self.assertEqual(self.unread_count(), 1)
+
+
+class NotificationPushTestCase(TestCase):
+    """Tests for the server-sent events and long-poll endpoints."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.fan = User.objects.create_user(username="fan", password="testpass123")
+        self.headers = {"authorization": f"Token {Token.objects.create(user=self.author).key}"}
+        self.broker = get_broker()
+
+    async def wait_for_subscriber(self):
+        while not self.broker.subscriber_count(self.author.pk):
+            await asyncio.sleep(0.01)
+
+    async def test_long_poll_returns_new_notification(self):
+        poll = asyncio.ensure_future(
+            self.async_client.get(reverse("notification_poll"), {"timeout": 5}, headers=self.headers)
+        )
+        await self.wait_for_subscriber()
+        await sync_to_async(notify)(self.author, self.fan, "follow", self.author)
+
+        response = await poll
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([n["verb"] for n in response.json()["results"]], ["follow"])
+        self.assertEqual(self.broker.subscriber_count(self.author.pk), 0)
+
+    async def test_long_poll_replays_missed_notifications(self):
+        await sync_to_async(notify)(self.author, self.fan, "follow", self.author)
+        response = await self.async_client.get(
+            reverse("notification_poll"), {"last_event_id": 0}, headers=self.headers
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    async def test_stream_pushes_events(self):
+        response = await self.async_client.get(reverse("notification_stream"), headers=self.headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+
+        await sync_to_async(notify)(self.author, self.fan, "follow", self.author)
+        event = (await asyncio.wait_for(anext(stream), 5)).decode()
+        self.assertIn("event: notification", event)
+        self.assertIn('"verb": "follow"', event)
+        await stream.aclose()
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse("notification_poll"))
+        self.assertEqual(response.status_code, 401)
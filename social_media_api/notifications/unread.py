@@ -0,0 +1,62 @@
+"""
+Cached per-user unread notification counters.
+
+The counter is seeded from the database the first time it is read and is then
+kept up to date as notifications are written and marked as read, so the unread
+badge is a single cache read.
+
+Counters expire after ``NOTIFICATIONS_UNREAD_CACHE_TIMEOUT`` seconds and are
+then seeded again, which bounds how long a counter can drift from the
+database: with a per-process cache, a process only sees its own increments.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+
+def get_timeout():
+    return getattr(settings, 'NOTIFICATIONS_UNREAD_CACHE_TIMEOUT', 300)
+
+
+def cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    count = cache.get(cache_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+        # add() so a counter seeded concurrently by an increment is not overwritten.
+        if not cache.add(cache_key(user_id), count, timeout=get_timeout()):
+            count = cache.get(cache_key(user_id), count)
+    return max(count, 0)
+
+
+def increment(user_id, delta=1):
+    """
+    Adjust a counter that is already cached. Missing counters are seeded on the next read.
+    """
+    try:
+        cache.incr(cache_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def decrement(user_id, delta=1):
+    increment(user_id, -delta)
+
+
+def reset(user_id):
+    cache.set(cache_key(user_id), 0, timeout=get_timeout())
+
+
+def on_notifications_created(notifications, merged):
+    """
+    Dispatcher listener: count newly written notifications per recipient.
+    Merged notifications were already unread and are not counted again.
+    """
+    for recipient_id, created in Counter(n.recipient_id for n in notifications).items():
+        increment(recipient_id, created)
@@ -1,8 +1,19 @@
 
 from django.urls import path
-from .views import NotificationListView, NotificationMarkAsReadView
+from .views import (
+    NotificationListView,
+    NotificationMarkAsReadView,
+    NotificationMarkAllAsReadView,
+    NotificationUnreadCountView,
+    notification_poll,
+    notification_stream,
+)
 
 urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notification_list'),
     path('notifications/<int:pk>/read/', NotificationMarkAsReadView.as_view(), name='notification_read'),
+    path('notifications/read-all/', NotificationMarkAllAsReadView.as_view(), name='notification_read_all'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification_unread_count'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
+    path('notifications/poll/', notification_poll, name='notification_poll'),
 ]
@@ -1,5 +1,15 @@
-from rest_framework import generics
+import json
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from accounts.authentication import aauthenticate_token
+from . import unread
+from .broker import get_broker, notification_message
+from .compiled import NotificationRowSerializer
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -14,6 +24,18 @@ class NotificationListView(generics.ListAPIView):
         # Filter notifications for the current user and order them by newest first
         return Notification.objects.filter(recipient=self.request.user).order_by('-timestamp')
 
+    def list(self, request, *args, **kwargs):
+        """
+        List notifications through the compiled read-only serializer, which
+        loads actors and generic targets in bulk for the whole page.
+        """
+        serializer = NotificationRowSerializer(context=self.get_serializer_context())
+        queryset = serializer.prepare(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
 class NotificationMarkAsReadView(generics.UpdateAPIView):
     """
     API view to mark a specific notification as read.
@@ -28,6 +50,114 @@ class NotificationMarkAsReadView(generics.UpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
-        instance.read = True
-        instance.save()
-        return Response({"detail": "Notification marked as read."}, status=status.HTTP_200_OK)
\ No newline at end of file
+        # Only the request that actually flips the flag adjusts the unread counter.
+        if Notification.objects.filter(pk=instance.pk, read=False).update(read=True):
+            unread.decrement(request.user.pk)
+        return Response({"detail": "Notification marked as read."}, status=status.HTTP_200_OK)
+
+
+class NotificationMarkAllAsReadView(APIView):
+    """
+    API view to mark all of the user's notifications as read with a single UPDATE.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        updated = Notification.objects.filter(recipient=request.user, read=False).update(read=True)
+        unread.reset(request.user.pk)
+        return Response({"detail": "All notifications marked as read.", "updated": updated}, status=status.HTTP_200_OK)
+
+
+class NotificationUnreadCountView(APIView):
+    """
+    API view returning the number of unread notifications from the cached counter.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({"unread_count": unread.get_unread_count(request.user.pk)})
+
+
+# Push endpoints (ASGI)
+# These are plain async Django views: DRF views are synchronous and would hold
+# a worker thread for the whole lifetime of the connection.
+
+def _unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+def _sse_event(message):
+    return f"id: {message['id']}\nevent: notification\ndata: {json.dumps(message)}\n\n"
+
+
+async def _missed_notifications(user, last_id):
+    queryset = Notification.objects.filter(recipient=user, pk__gt=last_id).order_by('pk')
+    return [notification_message(n) async for n in queryset[:100]]
+
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def notification_stream(request):
+    """
+    Server-sent events stream of new notifications for the authenticated user.
+    Reconnecting clients send Last-Event-ID to receive what they missed.
+    """
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+
+    heartbeat = getattr(settings, 'NOTIFICATIONS_STREAM_HEARTBEAT', 15)
+    last_id = _last_event_id(request)
+    # Subscribe before replaying so nothing published in between is lost.
+    subscription = get_broker().subscribe(user.pk)
+
+    async def events():
+        with subscription:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            seen = 0
+            if last_id is not None:
+                for message in await _missed_notifications(user, last_id):
+                    seen = message['id']
+                    yield _sse_event(message)
+            while True:
+                message = await subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                elif message['id'] > seen:
+                    yield _sse_event(message)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def notification_poll(request):
+    """
+    Long-poll for new notifications: returns as soon as there is a notification
+    newer than ``last_event_id``, or an empty list after ``timeout`` seconds.
+    """
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+
+    max_timeout = getattr(settings, 'NOTIFICATIONS_POLL_TIMEOUT', 30)
+    try:
+        timeout = min(float(request.GET.get('timeout', max_timeout)), max_timeout)
+    except ValueError:
+        timeout = max_timeout
+    last_id = _last_event_id(request)
+
+    with get_broker().subscribe(user.pk) as subscription:
+        if last_id is not None:
+            missed = await _missed_notifications(user, last_id)
+            if missed:
+                return JsonResponse({"results": missed})
+        message = await subscription.get(timeout=timeout)
+    return JsonResponse({"results": [message] if message else []})
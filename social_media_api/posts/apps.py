@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from . import feed_cache
+        from .like_buffer import like_buffer
+
+        # Buffered likes change is_liked on the likers' feeds once they are flushed.
+        like_buffer.connect(
+            lambda liked, unliked: feed_cache.invalidate({user_id for user_id, _ in liked + unliked})
+        )
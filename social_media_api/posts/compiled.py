@@ -0,0 +1,173 @@
+"""
+Compiled, read-only serialization for hot list endpoints.
+
+DRF ModelSerializers build a field tree per serializer and run every field's
+``get_attribute``/``to_representation`` for every object, which dominates CPU
+time on large pages. The serializers here select exactly the columns they
+need with ``.values()`` and turn each row into a dict with a fixed sequence of
+key lookups. Their output is identical to the ModelSerializers they stand in
+for (PostListSerializer, CommentSerializer, ...); those remain the serializers
+for writes and single-object responses.
+
+Run ``python manage.py benchmark_serializers`` to compare both paths.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Like
+
+
+def datetime_formatter():
+    """
+    Return a function formatting datetimes the way DRF's DateTimeField does
+    with the default ISO 8601 output: in the current time zone, with a
+    trailing 'Z' for UTC.
+    """
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def file_url_formatter(field, request=None):
+    """
+    Return a function that turns a stored file name into the URL DRF's
+    FileField/ImageField would render.
+    """
+    storage = field.storage
+
+    def format_url(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    return format_url
+
+
+class CompiledSerializer:
+    """
+    Base class: ``values`` lists the columns to select and ``compile()``
+    returns the function that turns one row into the output dict.
+    """
+    values = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def prepare(self, queryset):
+        return queryset.values(*self.values)
+
+    def compile(self, rows):
+        raise NotImplementedError
+
+    def serialize(self, rows):
+        rows = list(rows)
+        to_representation = self.compile(rows)
+        return [to_representation(row) for row in rows]
+
+    def serialize_by_pk(self, queryset):
+        """
+        Serialize ``queryset`` into ``{pk: dict}``. ``values`` must include 'id'.
+        """
+        rows = list(self.prepare(queryset))
+        to_representation = self.compile(rows)
+        return {row['id']: to_representation(row) for row in rows}
+
+
+class AuthorRowSerializer(CompiledSerializer):
+    """
+    Stands in for AuthorSerializer.
+    """
+    values = ('id', 'username', 'email')
+
+    def compile(self, rows):
+        def to_representation(row):
+            return {'username': row['username'], 'email': row['email']}
+
+        return to_representation
+
+
+class PostSummaryRowSerializer(CompiledSerializer):
+    """
+    Stands in for PostSerializer.
+    """
+    values = ('id', 'content', 'created_at')
+
+    def compile(self, rows):
+        format_datetime = datetime_formatter()
+
+        def to_representation(row):
+            return {
+                'id': row['id'],
+                'content': row['content'],
+                'created_at': format_datetime(row['created_at']),
+            }
+
+        return to_representation
+
+
+class PostRowSerializer(CompiledSerializer):
+    """
+    Stands in for PostListSerializer.
+    """
+    values = ('id', 'author__username', 'author__email', 'content', 'created_at', 'like_count')
+
+    def liked_post_ids(self, rows):
+        if 'liked_post_ids' in self.context:
+            return set(self.context['liked_post_ids'])
+        request = self.context.get('request', None)
+        if not rows or request is None or not request.user.is_authenticated:
+            return set()
+        return set(
+            Like.objects.filter(user=request.user, post_id__in=[row['id'] for row in rows])
+            .values_list('post_id', flat=True)
+        )
+
+    def compile(self, rows):
+        liked_post_ids = self.liked_post_ids(rows)
+        format_datetime = datetime_formatter()
+
+        def to_representation(row):
+            return {
+                'id': row['id'],
+                'author': {'username': row['author__username'], 'email': row['author__email']},
+                'content': row['content'],
+                'created_at': format_datetime(row['created_at']),
+                'like_count': row['like_count'],
+                'is_liked': row['id'] in liked_post_ids,
+            }
+
+        return to_representation
+
+
+class CommentRowSerializer(CompiledSerializer):
+    """
+    Stands in for CommentSerializer.
+    """
+    values = ('id', 'author__username', 'author__email', 'post_id', 'content', 'created_at')
+
+    def compile(self, rows):
+        format_datetime = datetime_formatter()
+
+        def to_representation(row):
+            return {
+                'id': row['id'],
+                'author': {'username': row['author__username'], 'email': row['author__email']},
+                'post': row['post_id'],
+                'content': row['content'],
+                'created_at': format_datetime(row['created_at']),
+            }
+
+        return to_representation
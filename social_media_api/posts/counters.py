@@ -0,0 +1,100 @@
+"""
+Denormalized counters on Post and User.
+
+The counters are adjusted with F() expressions at the point where the
+underlying rows change, so concurrent requests never overwrite each other's
+increments. ``reconcile_*`` recompute them from the source tables in bulk and
+are used by the ``reconcile_counters`` management command to repair drift.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Like, Post
+
+User = get_user_model()
+Follow = User.followers.through
+
+
+def adjust(model, pk, **deltas):
+    """
+    Atomically add ``deltas`` to the counter columns of a single row.
+    Example: adjust(Post, post.pk, like_count=1)
+    """
+    model.objects.filter(pk=pk).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def count_of(model, field):
+    """
+    Correlated subquery counting the rows of ``model`` whose ``field`` points at the outer row.
+    """
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def _reconcile(queryset, batch_size, **expressions):
+    """
+    Rewrite the counters of ``queryset`` in primary key ranges of ``batch_size`` rows.
+    """
+    fields = list(expressions)
+    drifted = 0
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        batch = queryset.filter(pk__gte=pks[0], pk__lte=pks[-1])
+        for row in batch.annotate(**{f'actual_{field}': expr for field, expr in expressions.items()}).values(
+            'pk', *fields, *[f'actual_{field}' for field in fields]
+        ):
+            if any(row[field] != row[f'actual_{field}'] for field in fields):
+                drifted += 1
+        batch.update(**expressions)
+        last_pk = pks[-1]
+    return drifted
+
+
+def refresh_like_counts(post_ids):
+    """
+    Recompute like_count for the given posts in a single UPDATE.
+    """
+    Post.objects.filter(pk__in=post_ids).update(like_count=count_of(Like, 'post'))
+
+
+def refresh_follow_counts(user_ids):
+    """
+    Recompute followers_count and following_count for the given users in a single UPDATE.
+    """
+    User.objects.filter(pk__in=user_ids).update(
+        followers_count=count_of(Follow, 'from_user'),
+        following_count=count_of(Follow, 'to_user'),
+    )
+
+
+def reconcile_post_counters(batch_size=1000):
+    return _reconcile(
+        Post.objects.all(),
+        batch_size,
+        like_count=count_of(Like, 'post'),
+        comment_count=count_of(Comment, 'post'),
+    )
+
+
+def reconcile_user_counters(batch_size=1000):
+    # In the followers through table, from_user is the followed account and
+    # to_user is the follower.
+    return _reconcile(
+        User.objects.all(),
+        batch_size,
+        followers_count=count_of(Follow, 'from_user'),
+        following_count=count_of(Follow, 'to_user'),
+        posts_count=count_of(Post, 'author'),
+    )
@@ -0,0 +1,68 @@
+"""
+Per-user cache of serialized feed pages.
+
+Every user has a version number in the cache. Page keys include that version,
+so invalidating a user's feed is a single delete of the version key: the next
+read starts a new version and the old pages simply expire. Versions are
+dropped when an author the user follows posts, when the user follows or
+unfollows someone, and when the user's likes change.
+
+Posts from authors that are not fanned out (see posts.timeline) do not
+invalidate their followers' feeds. Versions therefore live no longer than
+the pages themselves, ``FEED_CACHE_TIMEOUT`` seconds: when one expires the
+page is rebuilt with those posts and gets a new ETag.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+INVALIDATE_BATCH_SIZE = 1000
+
+
+def get_timeout():
+    return getattr(settings, 'FEED_CACHE_TIMEOUT', 60)
+
+
+def version_key(user_id):
+    return f'feed:version:{user_id}'
+
+
+def get_version(user_id):
+    # A time-based initial value never collides with a version that was evicted.
+    return cache.get_or_set(version_key(user_id), time.time_ns, timeout=get_timeout())
+
+
+def page_key(user_id, cursor=None, page_size=None):
+    return f'feed:page:{user_id}:{get_version(user_id)}:{cursor or ""}:{page_size or ""}'
+
+
+def etag_for(key):
+    return '"%s"' % hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def get_page(key):
+    return cache.get(key)
+
+
+def set_page(key, data):
+    cache.set(key, data, get_timeout())
+
+
+def invalidate(user_ids):
+    """
+    Drop the cached feed pages of the given users.
+    """
+    keys = [version_key(user_id) for user_id in user_ids]
+    for start in range(0, len(keys), INVALIDATE_BATCH_SIZE):
+        cache.delete_many(keys[start:start + INVALIDATE_BATCH_SIZE])
+
+
+def invalidate_followers(author):
+    """
+    Drop the cached feed pages of everyone following ``author``.
+    """
+    from accounts import follow_graph
+
+    invalidate(list(follow_graph.stream_follower_ids(author.pk)))
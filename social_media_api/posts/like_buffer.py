@@ -0,0 +1,163 @@
+"""
+Write-behind buffer for likes.
+
+When ``LIKE_BUFFER_ENABLED`` is on, like/unlike requests only record the
+user's latest intent for a post in memory. A background thread flushes the
+buffer every ``LIKE_BUFFER_FLUSH_INTERVAL`` seconds with bulk inserts, bulk
+deletes and one counter refresh, so a viral post no longer serializes
+every click on the unique (post, user) index.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from . import counters
+from .models import Like
+
+logger = logging.getLogger(__name__)
+
+# Pending pairs matched per query by flush().
+PAIR_BATCH_SIZE = 250
+
+
+def is_enabled():
+    return getattr(settings, 'LIKE_BUFFER_ENABLED', False)
+
+
+def _pair_filters(pairs):
+    """
+    Yield Q objects that together match the (user_id, post_id) ``pairs``.
+    Pairs are grouped by post, so a viral post costs one ``user_id IN (...)``
+    term, and split into batches that stay well within SQLite's expression
+    depth limit.
+    """
+    for start in range(0, len(pairs), PAIR_BATCH_SIZE):
+        user_ids_by_post = defaultdict(list)
+        for user_id, post_id in pairs[start:start + PAIR_BATCH_SIZE]:
+            user_ids_by_post[post_id].append(user_id)
+        yield reduce(or_, (
+            Q(post_id=post_id, user_id__in=user_ids) for post_id, user_ids in user_ids_by_post.items()
+        ))
+
+
+class LikeBuffer:
+    """
+    Collects like/unlike intents keyed by (user_id, post_id) and writes them in batches.
+    Only the last intent per key is kept, so a like followed by an unlike within
+    one interval costs nothing at the database.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._flush_listeners = []
+
+    def get_flush_interval(self):
+        if self.flush_interval is not None:
+            return self.flush_interval
+        return getattr(settings, 'LIKE_BUFFER_FLUSH_INTERVAL', 0.5)
+
+    def add(self, user_id, post_id, liked):
+        with self._lock:
+            self._pending[(user_id, post_id)] = liked
+        self._ensure_worker()
+
+    def like(self, user_id, post_id):
+        self.add(user_id, post_id, True)
+
+    def unlike(self, user_id, post_id):
+        self.add(user_id, post_id, False)
+
+    def connect(self, listener):
+        """
+        Register ``listener(liked_pairs, unliked_pairs)``, called after each flush.
+        ``liked_pairs`` holds only the likes the flush inserted, not those
+        that already existed.
+        """
+        self._flush_listeners.append(listener)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Write all pending intents to the database and return how many were written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        liked = [key for key, value in pending.items() if value]
+        unliked = [key for key, value in pending.items() if not value]
+        try:
+            with transaction.atomic():
+                if liked:
+                    existing = set()
+                    for condition in _pair_filters(liked):
+                        existing.update(Like.objects.filter(condition).values_list('user_id', 'post_id'))
+                    liked = [key for key in liked if key not in existing]
+                if liked:
+                    Like.objects.bulk_create(
+                        [Like(user_id=user_id, post_id=post_id) for user_id, post_id in liked],
+                        ignore_conflicts=True,
+                    )
+                for condition in _pair_filters(unliked):
+                    Like.objects.filter(condition).delete()
+                counters.refresh_like_counts({post_id for _, post_id in pending})
+        except Exception:
+            # Put the batch back unless a newer intent arrived in the meantime.
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            raise
+
+        for listener in self._flush_listeners:
+            listener(liked, unliked)
+        return len(pending)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='like-buffer', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while not self._wakeup.wait(self.get_flush_interval()):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush the like buffer")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+        self._worker = None
+        self._wakeup.clear()
+        self.flush()
+
+
+like_buffer = LikeBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    if len(like_buffer):
+        like_buffer.flush()
@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notifications.compiled import NotificationRowSerializer
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from posts.compiled import CommentRowSerializer, PostRowSerializer
+from posts.models import Comment, Post
+from posts.serializers import CommentSerializer, PostListSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the CPU time of the DRF list serializers with the compiled ones on one page. "
+        "Sample rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Items per page.")
+        parser.add_argument('--repeat', type=int, default=50, help="Timed runs per serializer.")
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            self.create_sample(rows)
+            self.report('posts', repeat, *self.posts_case(rows))
+            self.report('comments', repeat, *self.comments_case(rows))
+            self.report('notifications', repeat, *self.notifications_case(rows))
+            transaction.set_rollback(True)
+
+    def create_sample(self, rows):
+        self.recipient = User.objects.create(username='benchmark-recipient')
+        self.actor = User.objects.create(username='benchmark-actor', bio='Benchmark actor')
+        self.posts = Post.objects.bulk_create(
+            Post(author=self.recipient, content=f"Benchmark post {i}") for i in range(rows)
+        )
+        self.comments = Comment.objects.bulk_create(
+            Comment(author=self.actor, post=post, content="Benchmark comment") for post in self.posts
+        )
+        post_type = ContentType.objects.get_for_model(Post)
+        comment_type = ContentType.objects.get_for_model(Comment)
+        Notification.objects.bulk_create(
+            Notification(
+                recipient=self.recipient,
+                actor=self.actor,
+                verb='like' if i % 2 else 'comment',
+                content_type=post_type if i % 2 else comment_type,
+                object_id=self.posts[i].pk if i % 2 else self.comments[i].pk,
+            )
+            for i in range(rows)
+        )
+
+    def posts_case(self, rows):
+        queryset = Post.objects.filter(author=self.recipient).select_related('author')
+        context = {'liked_post_ids': set()}
+        instances = list(queryset)
+        values = list(PostRowSerializer().prepare(queryset))
+        return (
+            lambda: PostListSerializer(instances, many=True, context=context).data,
+            lambda: PostRowSerializer(context=context).serialize(values),
+        )
+
+    def comments_case(self, rows):
+        queryset = Comment.objects.filter(author=self.actor).select_related('author')
+        instances = list(queryset)
+        values = list(CommentRowSerializer().prepare(queryset))
+        return (
+            lambda: CommentSerializer(instances, many=True).data,
+            lambda: CommentRowSerializer().serialize(values),
+        )
+
+    def notifications_case(self, rows):
+        queryset = Notification.objects.filter(recipient=self.recipient)
+        instances = list(queryset.with_targets())
+        values = list(NotificationRowSerializer().prepare(queryset))
+        # The compiled path loads the targets while serializing, so its time includes those queries.
+        return (
+            lambda: NotificationSerializer(instances, many=True).data,
+            lambda: NotificationRowSerializer().serialize(values),
+        )
+
+    def report(self, name, repeat, drf, compiled):
+        drf_time = self.measure(drf, repeat)
+        compiled_time = self.measure(compiled, repeat)
+        self.stdout.write(
+            f"{name}: DRF {drf_time * 1000:.2f} ms/page, compiled {compiled_time * 1000:.2f} ms/page "
+            f"({drf_time / compiled_time:.1f}x faster)"
+        )
+
+    def measure(self, serialize, repeat):
+        serialize()
+        started = time.process_time()
+        for _ in range(repeat):
+            serialize()
+        return (time.process_time() - started) / repeat
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like, comment, follower and post counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows updated per statement.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = counters.reconcile_post_counters(batch_size=batch_size)
+        users = counters.reconcile_user_counters(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled counters: {posts} post(s) and {users} user(s) had drifted."
+        ))
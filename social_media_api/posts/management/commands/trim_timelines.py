@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Delete timeline entries beyond FEED_TIMELINE_MAX_LENGTH for every user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Number of users trimmed per query.")
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        batch_size = options['batch_size']
+
+        deleted = 0
+        batch = []
+        for user_id in user_ids.iterator():
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                deleted += timeline.trim_timelines(batch)
+                batch = []
+        if batch:
+            deleted += timeline.trim_timelines(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} timeline entries."))
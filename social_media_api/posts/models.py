@@ -9,6 +9,17 @@ class Post(models.Model):
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, maintained with F() updates (see posts.counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Serves the (created_at, id) keyset of PostCursorPagination in both directions.
+            models.Index(fields=['-created_at', '-id'], name='post_created_idx'),
+            # Serves the feed's merge of celebrity posts and backfills of one author's recent posts.
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+        ]
 
     def __str__(self):
         return f'Post by {self.author.username} at {self.created_at.strftime("%Y-%m-%d")}'
@@ -32,4 +43,24 @@ class Like(models.Model):
         unique_together = ('post', 'user') # Ensure a user can only like a post once
 
     def __str__(self):
-        return f'{self.user.username} likes {self.post.id}'
\ No newline at end of file
+        return f'{self.user.username} likes {self.post.id}'
+
+class TimelineEntry(models.Model):
+    """
+    A precomputed entry in a user's home timeline.
+    Rows are written when a post is created (fan-out-on-write) so that feed reads
+    become an indexed range scan over (user, post) instead of a large IN-subquery.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            # Serves the feed's (created_at, post) keyset within one user's timeline.
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_position_idx'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} in timeline of user {self.user_id}'
@@ -0,0 +1,164 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def keyset_condition(cursor, created_field='created_at', id_field='id'):
+    """
+    Q for the rows after ``cursor`` in (created_at, id) order: older rows, or
+    newer ones for a reversed cursor. The leading range condition lets the
+    database seek into a (created_at, id) index instead of scanning up to
+    the cursor.
+    """
+    created_at, pk, reverse = cursor
+    op = 'gt' if reverse else 'lt'
+    return Q(**{f'{created_field}__{op}e': created_at}) & (
+        Q(**{f'{created_field}__{op}': created_at}) | Q(**{f'{id_field}__{op}': pk})
+    )
+
+
+class PostCursorPagination(BasePagination):
+    """
+    Keyset pagination over posts ordered by (created_at, id), newest first.
+
+    Each page is fetched with a WHERE clause on the last seen (created_at, id)
+    pair instead of an OFFSET, and no COUNT(*) query is issued, so deep pages
+    cost the same as the first one. The cursors handed to clients are opaque
+    and stay valid while new posts are being inserted.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        return self.set_page(list(page_queryset))
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the (unevaluated) queryset for the requested page, with one extra row
+        to find out whether there is another page.
+        """
+        self.read_request(request)
+        if self.cursor is not None:
+            queryset = queryset.filter(keyset_condition(self.cursor))
+        if self.reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+        return queryset[:self.page_size + 1]
+
+    def read_request(self, request):
+        """
+        Read the page size and cursor of ``request``. For pages not fetched
+        through get_page_queryset, fetch ``page_size + 1`` rows after
+        ``self.cursor`` and pass them to set_page.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor[2]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_previous = self.cursor is not None
+            self.has_next = has_more
+
+        return self.page
+
+    def get_query_params(self, request):
+        # Async views receive a plain Django HttpRequest rather than a DRF Request.
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(self.get_query_params(request)[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = self.get_query_params(request).get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            created_at = parse_datetime(tokens['t'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, reverse
+
+    def get_position(self, post):
+        # Pages hold Post instances, or dict rows when the queryset was built with .values().
+        if isinstance(post, dict):
+            return post['created_at'], post['id']
+        return post.created_at, post.pk
+
+    def encode_cursor(self, post, reverse=False):
+        created_at, pk = self.get_position(post)
+        tokens = {'t': created_at.isoformat(), 'i': pk}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Paging forward from the start of a reversed page that came back empty.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
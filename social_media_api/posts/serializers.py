@@ -47,8 +47,11 @@ class PostListSerializer(serializers.ModelSerializer):
 
     def get_is_liked(self, obj):
         """
-        Check if the request user has liked the post.
+        Check if the request user has liked the post, using the
+        ``liked_post_ids`` context entry when the caller already loaded it.
         """
+        if 'liked_post_ids' in self.context:
+            return obj.pk in self.context['liked_post_ids']
         request = self.context.get('request', None)
         if request and request.user.is_authenticated:
             return Like.objects.filter(post=obj, user=request.user).exists()
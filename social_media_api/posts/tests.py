@@ -1,3 +1,494 @@
-from django.test import TestCase
+import time
+from array import array
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts import follow_graph
+from .like_buffer import like_buffer
+from .models import Comment, Like, Post, TimelineEntry
+from .serializers import CommentSerializer, PostListSerializer
+
+User = get_user_model()
+
+
+class TimelineTestCase(APITestCase):
+    """Tests for the materialized home timeline."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.stranger = User.objects.create_user(username="stranger", password="testpass123")
+        self.client.force_authenticate(self.reader)
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.id}))
+        self.author.refresh_from_db()
+        self.feed_url = reverse("feed-list")
+
+    def create_post(self, user, content):
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse("post-list"), {"content": content})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Post.objects.get(pk=response.data["id"])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        post = self.create_post(self.author, "hello followers")
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(user=self.stranger, post=post).exists())
+
+    def test_fan_out_does_not_trust_a_stale_graph(self):
+        # Another process's cache may still hold the list from before the follow.
+        cache.set(follow_graph.cache_key(follow_graph.FOLLOWERS, self.author.pk), array("q"))
+        post = self.create_post(self.author, "after the follow")
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+    @override_settings(FEED_CELEBRITY_FOLLOWER_THRESHOLD=1)
+    def test_celebrity_merge_does_not_trust_a_stale_graph(self):
+        post = self.create_post(self.author, "celebrity post")
+        cache.set(follow_graph.cache_key(follow_graph.FOLLOWING, self.reader.pk), array("q"))
+
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(self.feed_url)
+        self.assertEqual([p["id"] for p in response.data["results"]], [post.id])
+
+    def test_feed_reads_from_timeline(self):
+        self.create_post(self.author, "first")
+        self.create_post(self.stranger, "not followed")
+        self.create_post(self.author, "second")
+
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(self.feed_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["content"] for p in response.data["results"]], ["second", "first"])
+
+    @override_settings(FEED_CELEBRITY_FOLLOWER_THRESHOLD=1)
+    def test_celebrity_posts_are_merged_on_read(self):
+        post = self.create_post(self.author, "celebrity post")
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(self.feed_url)
+        self.assertEqual([p["id"] for p in response.data["results"]], [post.id])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        post = self.create_post(self.stranger, "older post")
+
+        self.client.force_authenticate(self.reader)
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.stranger.id}))
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+        self.client.post(reverse("unfollow_user", kwargs={"user_id": self.stranger.id}))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+    @override_settings(FEED_TIMELINE_MAX_LENGTH=3)
+    def test_timelines_are_trimmed_to_max_length(self):
+        posts = [Post.objects.create(author=self.stranger, content=f"post {i}") for i in range(5)]
+
+        self.client.force_authenticate(self.reader)
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.stranger.id}))
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader).order_by("-created_at", "-post_id")
+                 .values_list("post_id", flat=True)),
+            [post.id for post in reversed(posts[2:])],
+        )
+
+        for i in range(2):
+            self.create_post(self.author, f"fanned out {i}")
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        out = StringIO()
+        call_command("trim_timelines", stdout=out)
+        self.assertIn("Deleted 2 timeline entries", out.getvalue())
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 3)
+
+
+class PostCursorPaginationTestCase(APITestCase):
+    """Tests for keyset pagination of the feed and post listings."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.reader.following.add(self.author)
+        self.posts = [Post.objects.create(author=self.author, content=f"post {i}") for i in range(5)]
+        for post in self.posts:
+            TimelineEntry.objects.create(user=self.reader, post=post, created_at=post.created_at)
+        self.client.force_authenticate(self.reader)
+
+    def test_walks_feed_with_cursors(self):
+        response = self.client.get(reverse("feed-list"), {"page_size": 2})
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        seen = [p["id"] for p in response.data["results"]]
+
+        # A post created mid-scroll must not shift the following pages.
+        Post.objects.create(author=self.author, content="late post")
+
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen.extend(p["id"] for p in response.data["results"])
+
+        self.assertEqual(seen, [p.id for p in reversed(self.posts)])
+
+    def test_previous_cursor_returns_prior_page(self):
+        first = self.client.get(reverse("post-list-posts"), {"page_size": 2})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(
+            [p["id"] for p in back.data["results"]],
+            [p["id"] for p in first.data["results"]],
+        )
+
+    @override_settings(FEED_CELEBRITY_FOLLOWER_THRESHOLD=2)
+    def test_walks_celebrity_posts_merged_into_feed(self):
+        celebrity = User.objects.create_user(username="celebrity", password="testpass123")
+        fan = User.objects.create_user(username="fan", password="testpass123")
+        celebrity.followers.add(self.reader, fan)
+        User.objects.filter(pk=celebrity.pk).update(followers_count=2)
+        # Interleave the celebrity's posts, read on demand, with the timeline's.
+        for i in range(5):
+            post = Post.objects.create(author=self.author, content=f"followed {i}")
+            TimelineEntry.objects.create(user=self.reader, post=post, created_at=post.created_at)
+            Post.objects.create(author=celebrity, content=f"celebrity {i}")
+        newest_first = list(
+            Post.objects.filter(author__in=[self.author, celebrity])
+            .order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        response = self.client.get(reverse("feed-list"), {"page_size": 3})
+        seen = [p["id"] for p in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen.extend(p["id"] for p in response.data["results"])
+        self.assertEqual(seen, newest_first)
+
+        back = self.client.get(response.data["previous"])
+        self.assertEqual([p["id"] for p in back.data["results"]], newest_first[9:12])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("feed-list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PostListSerializerQueryTestCase(APITestCase):
+    """The feed must run a constant number of queries regardless of page size."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.reader.following.add(*[
+            User.objects.create_user(username=f"author{i}", password="testpass123") for i in range(3)
+        ])
+        for i, author in enumerate(self.reader.following.all()):
+            for j in range(10):
+                post = Post.objects.create(author=author, content=f"{i}-{j}")
+                TimelineEntry.objects.create(user=self.reader, post=post, created_at=post.created_at)
+                if j % 2:
+                    Like.objects.create(user=self.reader, post=post)
+        self.client.force_authenticate(self.reader)
+
+    def fetch_feed(self, page_size):
+        return self.client.get(reverse("feed-list"), {"page_size": page_size})
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        # Timeline positions, the page's posts and their likes; the first
+        # request also loads the shared list of celebrity accounts.
+        with self.assertNumQueries(4):
+            small = self.fetch_feed(2)
+        with self.assertNumQueries(3):
+            large = self.fetch_feed(30)
+
+        self.assertEqual(len(small.data["results"]), 2)
+        self.assertEqual(len(large.data["results"]), 30)
+        for post in large.data["results"]:
+            liked = Like.objects.filter(post_id=post["id"], user=self.reader).exists()
+            self.assertEqual(post["is_liked"], liked)
+            self.assertEqual(post["like_count"], Post.objects.get(pk=post["id"]).like_count)
+
+
+class CompiledSerializerTestCase(APITestCase):
+    """The compiled list serializers must match the DRF serializers they replace."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", email="r@example.com", password="testpass123")
+        author = User.objects.create_user(username="author", email="a@example.com", password="testpass123")
+        self.posts = [Post.objects.create(author=author, content=f"post {i}") for i in range(3)]
+        for post in self.posts:
+            Comment.objects.create(author=self.reader, post=post, content="nice")
+        Like.objects.create(user=self.reader, post=self.posts[1])
+        self.client.force_authenticate(self.reader)
+
+    def test_post_rows(self):
+        response = self.client.get(reverse("post-list-posts"))
+        expected = PostListSerializer(
+            Post.objects.order_by("-created_at", "-id"), many=True, context={"request": response.wsgi_request}
+        ).data
+        self.assertEqual(response.data["results"], expected)
+
+    def test_comment_rows(self):
+        response = self.client.get(reverse("comment-list"))
+        expected = CommentSerializer(Comment.objects.all(), many=True).data
+        self.assertEqual(response.data["results"], expected)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_serializers", "--rows", "20", "--repeat", "2", stdout=out)
+        self.assertIn("posts", out.getvalue())
+        self.assertEqual(Post.objects.count(), 3)
+
+
+class CounterTestCase(APITestCase):
+    """Tests for the denormalized counters on Post and User."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.fan = User.objects.create_user(username="fan", password="testpass123")
+
+    def test_counters_follow_interactions(self):
+        self.client.force_authenticate(self.fan)
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.id}))
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.id}))
+
+        self.client.force_authenticate(self.author)
+        post_id = self.client.post(reverse("post-list"), {"content": "counted"}).data["id"]
+
+        self.client.force_authenticate(self.fan)
+        self.client.post(reverse("like_post", kwargs={"pk": post_id}))
+        self.client.post(reverse("comment-list"), {"post": post_id, "content": "nice"})
+
+        post = Post.objects.get(pk=post_id)
+        self.author.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.assertEqual((post.like_count, post.comment_count), (1, 1))
+        self.assertEqual((self.author.followers_count, self.author.posts_count), (1, 1))
+        self.assertEqual(self.fan.following_count, 1)
+
+        self.client.post(reverse("unlike_post", kwargs={"pk": post_id}))
+        self.client.post(reverse("unfollow_user", kwargs={"user_id": self.author.id}))
+        post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(post.like_count, 0)
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        post = Post.objects.create(author=self.author, content="drifted")
+        Like.objects.create(post=post, user=self.fan)
+        self.author.followers.add(self.fan)
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+
+        post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.assertEqual(post.like_count, 1)
+        self.assertEqual((self.author.followers_count, self.author.posts_count), (1, 1))
+        self.assertEqual(self.fan.following_count, 1)
+        self.assertIn("1 post(s) and 2 user(s)", out.getvalue())
+
+
+@override_settings(LIKE_BUFFER_ENABLED=True, LIKE_BUFFER_FLUSH_INTERVAL=3600)
+class LikeBufferTestCase(APITestCase):
+    """Tests for the write-behind like buffer."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="testpass123") for i in range(3)]
+        self.post = Post.objects.create(author=self.author, content="viral")
+        self.addCleanup(like_buffer.flush)
+
+    def like(self, user, name="like_post"):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse(name, kwargs={"pk": self.post.pk}))
+
+    def test_likes_are_acknowledged_then_flushed_in_batch(self):
+        for fan in self.fans:
+            self.assertEqual(self.like(fan).status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Like.objects.exists())
+
+        # The last intent per user wins.
+        self.like(self.fans[0], "unlike_post")
+        self.like(self.fans[1])
+
+        # Savepoint, existing likes, bulk insert, bulk delete, counter refresh,
+        # release, then for the like notifications: the post authors, unread
+        # notifications to merge into, and one bulk insert.
+        with self.assertNumQueries(9):
+            self.assertEqual(like_buffer.flush(), 3)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+        self.assertEqual(
+            set(Like.objects.values_list("user_id", flat=True)),
+            {self.fans[1].pk, self.fans[2].pk},
+        )
+
+    def test_existing_likes_are_not_notified_again(self):
+        Like.objects.create(user=self.fans[0], post=self.post)
+        flushed = []
+        like_buffer.connect(lambda liked, unliked: flushed.append(liked))
+        self.addCleanup(like_buffer._flush_listeners.pop)
+
+        self.like(self.fans[0])
+        self.like(self.fans[1])
+        like_buffer.flush()
+
+        self.assertEqual(flushed, [[(self.fans[1].pk, self.post.pk)]])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+
+    def test_flushes_large_batches(self):
+        crowd = User.objects.bulk_create(User(username=f"crowd{i}") for i in range(1200))
+        other = Post.objects.create(author=self.author, content="also viral")
+        Like.objects.bulk_create(Like(user=user, post=other) for user in crowd)
+        posts = Post.objects.bulk_create(Post(author=self.author, content=f"post {i}") for i in range(600))
+        for user in crowd:
+            like_buffer.like(user.pk, self.post.pk)
+            like_buffer.unlike(user.pk, other.pk)
+        for post in posts:
+            like_buffer.like(self.fans[0].pk, post.pk)
+
+        self.assertEqual(like_buffer.flush(), 3000)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1200)
+        self.assertFalse(Like.objects.filter(post=other).exists())
+        self.assertEqual(Like.objects.filter(user=self.fans[0]).count(), 600)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1200)
+
+    def test_unknown_post(self):
+        self.client.force_authenticate(self.fans[0])
+        response = self.client.post(reverse("like_post", kwargs={"pk": 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FeedCacheTestCase(APITestCase):
+    """Tests for the per-user feed page cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.client.force_authenticate(self.reader)
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.id}))
+        self.author.refresh_from_db()
+
+    def get_feed(self, **headers):
+        self.client.force_authenticate(self.reader)
+        return self.client.get(reverse("feed-list"), headers=headers)
+
+    def test_cached_page_and_conditional_get(self):
+        first = self.get_feed()
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            cached = self.get_feed()
+        self.assertEqual(cached.data, first.data)
+
+        with self.assertNumQueries(0):
+            not_modified = self.get_feed(if_none_match=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_post_from_followed_author_invalidates(self):
+        etag = self.get_feed()["ETag"]
+
+        self.client.force_authenticate(self.author)
+        post_id = self.client.post(reverse("post-list"), {"content": "fresh"}).data["id"]
+
+        response = self.get_feed(if_none_match=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["id"] for p in response.data["results"]], [post_id])
+
+    @override_settings(FEED_CELEBRITY_FOLLOWER_THRESHOLD=1, FEED_CACHE_TIMEOUT=1)
+    def test_etag_expires_with_the_cached_page(self):
+        etag = self.get_feed()["ETag"]
+        # Celebrity posts are not fanned out and do not invalidate followers' feeds.
+        post = Post.objects.create(author=self.author, content="from a celebrity")
+        self.assertEqual(self.get_feed(if_none_match=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        time.sleep(1.1)
+        response = self.get_feed(if_none_match=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["id"] for p in response.data["results"]], [post.id])
+
+    def test_like_invalidates_likers_feed(self):
+        post = Post.objects.create(author=self.author, content="likeable")
+        TimelineEntry.objects.create(user=self.reader, post=post, created_at=post.created_at)
+        cache.clear()
+        self.assertFalse(self.get_feed().data["results"][0]["is_liked"])
+
+        self.client.post(reverse("like_post", kwargs={"pk": post.pk}))
+        self.assertTrue(self.get_feed().data["results"][0]["is_liked"])
+
+
+class AsyncReadPathTestCase(TestCase):
+    """Tests for the async feed and post endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.reader.following.add(self.author)
+        self.posts = [Post.objects.create(author=self.author, content=f"post {i}") for i in range(3)]
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(user=self.reader, post=post, created_at=post.created_at) for post in self.posts
+        )
+        Like.objects.create(user=self.reader, post=self.posts[0])
+        self.headers = {"authorization": f"Token {Token.objects.create(user=self.reader).key}"}
+
+    async def test_feed_pages_and_likes(self):
+        response = await self.async_client.get(reverse("async_feed"), {"page_size": 2}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual([p["id"] for p in page["results"]], [self.posts[2].pk, self.posts[1].pk])
+        self.assertIsNotNone(page["next"])
+
+        response = await self.async_client.get(page["next"], headers=self.headers)
+        results = response.json()["results"]
+        self.assertEqual([p["id"] for p in results], [self.posts[0].pk])
+        self.assertTrue(results[0]["is_liked"])
+        self.assertEqual(results[0]["author"]["username"], "author")
+
+    async def test_list_posts_pages_and_likes(self):
+        response = await self.async_client.get(reverse("async_list_posts"), {"page_size": 2}, headers=self.headers)
+        page = response.json()
+        self.assertEqual([p["is_liked"] for p in page["results"]], [False, False])
+
+        response = await self.async_client.get(page["next"], headers=self.headers)
+        results = response.json()["results"]
+        self.assertEqual([(p["id"], p["is_liked"]) for p in results], [(self.posts[0].pk, True)])
+
+    async def test_feed_not_modified(self):
+        etag = (await self.async_client.get(reverse("async_feed"), headers=self.headers))["ETag"]
+        response = await self.async_client.get(
+            reverse("async_feed"), headers={**self.headers, "if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_invalid_cursor(self):
+        response = await self.async_client.get(reverse("async_list_posts"), {"cursor": "bogus"}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_post_detail(self):
+        response = await self.async_client.get(
+            reverse("async_post_detail", kwargs={"pk": self.posts[0].pk}), headers=self.headers
+        )
+        expected = await sync_to_async(
+            lambda: self.client.get(reverse("post-detail", kwargs={"pk": self.posts[0].pk}), headers=self.headers)
+        )()
+        self.assertEqual(response.json(), expected.json())
+        response = await self.async_client.get(
+            reverse("async_post_detail", kwargs={"pk": 999}), headers=self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse("async_feed"))
+        self.assertEqual(response.status_code, 401)
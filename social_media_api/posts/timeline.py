@@ -0,0 +1,238 @@
+"""
+Materialized home timelines.
+
+Posts are pushed into their followers' timelines when they are created
+(fan-out-on-write). Authors with more followers than
+``FEED_CELEBRITY_FOLLOWER_THRESHOLD`` are skipped at write time and their posts
+are merged in when the feed is read instead (fan-out-on-read), so a single post
+never has to write millions of rows.
+
+Timelines keep the newest ``FEED_TIMELINE_MAX_LENGTH`` entries. They are
+trimmed when a follow copies posts in, and by ``manage.py trim_timelines``,
+which should run periodically to cut back what fan-out added since.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from accounts import follow_graph
+from . import feed_cache
+from .models import Post, TimelineEntry
+from .pagination import keyset_condition
+
+User = get_user_model()
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def get_celebrity_threshold():
+    return getattr(settings, 'FEED_CELEBRITY_FOLLOWER_THRESHOLD', 10000)
+
+
+def get_backfill_limit():
+    return getattr(settings, 'FEED_BACKFILL_LIMIT', 200)
+
+
+def get_max_length():
+    return getattr(settings, 'FEED_TIMELINE_MAX_LENGTH', 1000)
+
+
+def is_celebrity(author):
+    """
+    Return True when the author's posts should be read on demand instead of fanned out.
+    """
+    return author.followers_count >= get_celebrity_threshold()
+
+
+def get_celebrity_ids():
+    """
+    Ids of every account whose posts are not fanned out. There are few of them,
+    so the list is cached for everyone for ``FEED_CACHE_TIMEOUT`` seconds.
+    """
+    threshold = get_celebrity_threshold()
+    key = f'feed:celebrities:{threshold}'
+    celebrity_ids = cache.get(key)
+    if celebrity_ids is None:
+        celebrity_ids = list(User.objects.filter(followers_count__gte=threshold).values_list('id', flat=True))
+        cache.set(key, celebrity_ids, feed_cache.get_timeout())
+    return celebrity_ids
+
+
+def celebrity_ids_followed_by(user):
+    """
+    Ids of the accounts followed by ``user`` whose posts are not fanned out.
+    """
+    return sorted(follow_graph.following_among_in_db(user.pk, get_celebrity_ids()))
+
+
+def fan_out_post(post):
+    """
+    Write the post into the timeline of every follower of its author.
+    """
+    if is_celebrity(post.author):
+        return 0
+
+    follower_ids = follow_graph.stream_follower_ids(post.author_id, chunk_size=FAN_OUT_BATCH_SIZE)
+    written = 0
+    batch = []
+    for follower_id in follower_ids:
+        batch.append(TimelineEntry(user_id=follower_id, post_id=post.pk, created_at=post.created_at))
+        if len(batch) >= FAN_OUT_BATCH_SIZE:
+            written += _write_entries(batch)
+            batch = []
+    if batch:
+        written += _write_entries(batch)
+    return written
+
+
+def _write_entries(entries):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    feed_cache.invalidate([entry.user_id for entry in entries])
+    return len(entries)
+
+
+def backfill_author(user, author):
+    """
+    Copy the most recent posts of a newly followed author into the user's timeline.
+    """
+    if is_celebrity(author):
+        return 0
+
+    recent_posts = (
+        Post.objects.filter(author=author)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at')[:get_backfill_limit()]
+    )
+    entries = [
+        TimelineEntry(user_id=user.pk, post_id=post_id, created_at=created_at)
+        for post_id, created_at in recent_posts
+    ]
+    if entries:
+        TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        trim_timelines([user.pk])
+    return len(entries)
+
+
+def backfill_authors(user, authors):
+    """
+    Bulk variant of backfill_author: copy the recent posts of several newly
+    followed authors with one query and one insert.
+    """
+    author_ids = [author.pk for author in authors if not is_celebrity(author)]
+    if not author_ids:
+        return 0
+
+    recent_posts = (
+        Post.objects.filter(author_id__in=author_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=F('author_id'), order_by=[F('created_at').desc(), F('id').desc()]))
+        .filter(rank__lte=get_backfill_limit())
+        .values_list('id', 'created_at')
+    )
+    entries = [
+        TimelineEntry(user_id=user.pk, post_id=post_id, created_at=created_at)
+        for post_id, created_at in recent_posts
+    ]
+    if entries:
+        TimelineEntry.objects.bulk_create(entries, batch_size=FAN_OUT_BATCH_SIZE, ignore_conflicts=True)
+        trim_timelines([user.pk])
+    return len(entries)
+
+
+def remove_author(user, author):
+    """
+    Drop an unfollowed author's posts from the user's timeline.
+    """
+    return remove_authors(user, [author.pk])
+
+
+def remove_authors(user, author_ids):
+    """
+    Drop the posts of several unfollowed authors from the user's timeline.
+    """
+    deleted, _ = TimelineEntry.objects.filter(user=user, post__author_id__in=author_ids).delete()
+    return deleted
+
+
+def trim_timelines(user_ids):
+    """
+    Delete all but the newest ``FEED_TIMELINE_MAX_LENGTH`` entries of each
+    user's timeline. Returns the number of entries deleted.
+    """
+    ranked = (
+        TimelineEntry.objects.filter(user_id__in=user_ids)
+        .annotate(rank=Window(
+            RowNumber(), partition_by=F('user_id'), order_by=[F('created_at').desc(), F('post_id').desc()]
+        ))
+        .filter(rank__gt=get_max_length())
+        .values_list('id', flat=True)
+    )
+    deleted, _ = TimelineEntry.objects.filter(pk__in=list(ranked)).delete()
+    return deleted
+
+
+def get_feed_queryset(user):
+    """
+    Every post of the user's home feed, for looking up single posts. Pages
+    are read with get_feed_page_ids instead.
+    """
+    condition = Q(timeline_entries__user=user)
+    celebrity_ids = celebrity_ids_followed_by(user)
+    if celebrity_ids:
+        condition |= Q(author_id__in=celebrity_ids)
+    return Post.objects.filter(condition).select_related('author').distinct()
+
+
+def feed_position_querysets(user, celebrity_ids, cursor, limit):
+    """
+    The (created_at, post id) positions of the next ``limit`` feed items
+    after ``cursor``: one query on the user's timeline entries and one per
+    followed celebrity on their posts. Each is a range scan of an index
+    ordered like the feed that stops after ``limit`` rows, so their cost does
+    not depend on the length of the timeline or of a celebrity's history.
+    """
+    reverse = cursor is not None and cursor[2]
+    entries = TimelineEntry.objects.filter(user=user)
+    if cursor is not None:
+        entries = entries.filter(keyset_condition(cursor, id_field='post_id'))
+    entry_order = ('created_at', 'post_id') if reverse else ('-created_at', '-post_id')
+    querysets = [entries.order_by(*entry_order).values_list('created_at', 'post_id')[:limit]]
+
+    post_order = ('created_at', 'id') if reverse else ('-created_at', '-id')
+    for celebrity_id in celebrity_ids:
+        posts = Post.objects.filter(author_id=celebrity_id)
+        if cursor is not None:
+            posts = posts.filter(keyset_condition(cursor))
+        querysets.append(posts.order_by(*post_order).values_list('created_at', 'id')[:limit])
+    return querysets
+
+
+def merge_positions(position_lists, cursor, limit):
+    """
+    Merge the position lists of feed_position_querysets into the ids of the
+    first ``limit`` feed items, in the order of the cursor.
+    """
+    reverse = cursor is not None and cursor[2]
+    positions = sorted(set().union(*position_lists), reverse=not reverse)
+    return [post_id for _, post_id in positions[:limit]]
+
+
+def get_feed_page_ids(user, cursor, limit):
+    """
+    Return the ids of the next ``limit`` posts of the user's home feed after
+    ``cursor`` (see PostCursorPagination.read_request), newest first, or
+    oldest first for a reversed cursor.
+    """
+    querysets = feed_position_querysets(user, celebrity_ids_followed_by(user), cursor, limit)
+    return merge_positions([list(queryset) for queryset in querysets], cursor, limit)
+
+
+async def aget_feed_page_ids(user, cursor, limit):
+    """
+    Async variant of get_feed_page_ids.
+    """
+    celebrity_ids = await sync_to_async(celebrity_ids_followed_by)(user)
+    querysets = feed_position_querysets(user, celebrity_ids, cursor, limit)
+    return merge_positions([[row async for row in queryset] for queryset in querysets], cursor, limit)
@@ -1,15 +1,28 @@
 from django.urls import path, include
 from rest_framework.routers import SimpleRouter
-from .views import PostViewSet, CommentViewSet, UserFeedView, like_post, unlike_post
+from .views import (
+    PostViewSet,
+    CommentViewSet,
+    UserFeedView,
+    like_post,
+    unlike_post,
+    async_feed,
+    async_list_posts,
+    async_post_detail,
+)
 
 router = SimpleRouter()
 router.register('posts', PostViewSet)
 router.register('comments', CommentViewSet)
-router.register('feed', UserFeedView)
+router.register('feed', UserFeedView, basename='feed')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('posts/<int:pk>/like/', like_post, name='like_post'),
     path('posts/<int:pk>/unlike/', unlike_post, name='unlike_post'),
-    path('feed/', include(router.urls)),  
+
+    # Async (ASGI) read path
+    path('async/feed/', async_feed, name='async_feed'),
+    path('async/posts/', async_list_posts, name='async_list_posts'),
+    path('async/posts/<int:pk>/', async_post_detail, name='async_post_detail'),
 ]
@@ -1,24 +1,29 @@
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, mixins, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.http import HttpResponseNotModified, JsonResponse
 
+from accounts.authentication import aauthenticate_token
+from notifications.dispatch import notify
 from .models import Post, Comment, Like
+from . import counters, feed_cache, like_buffer, timeline
+from .compiled import CommentRowSerializer, PostRowSerializer
+from .pagination import PostCursorPagination
 from .serializers import (
     PostSerializer,
     CommentSerializer,
     PostListSerializer,
 )
 
-# A custom paginator for the user feed to control the number of posts per page.
-class PostPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+User = get_user_model()
 
 
 class PostViewSet(
@@ -32,8 +37,9 @@ class PostViewSet(
     A ViewSet for managing post-related actions.
     It supports creating, retrieving, updating, and deleting posts.
     """
-    queryset = Post.objects.all().annotate(like_count=Count('likes'))
+    queryset = Post.objects.select_related('author')
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PostCursorPagination
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -42,22 +48,40 @@ class PostViewSet(
 
     def perform_create(self, serializer):
         """
-        Set the author of the post to the current authenticated user.
+        Set the author of the post to the current authenticated user
+        and push the new post into the followers' timelines.
         """
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user)
+            counters.adjust(User, self.request.user.pk, posts_count=1)
+        # request.user may come from the token cache with an outdated
+        # followers_count, which decides whether the post is fanned out.
+        post.author = User.objects.get(pk=post.author_id)
+        timeline.fan_out_post(post)
+
+    def perform_update(self, serializer):
+        post = serializer.save()
+        if not timeline.is_celebrity(post.author):
+            feed_cache.invalidate_followers(post.author)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            counters.adjust(User, instance.author_id, posts_count=-1)
+        if not timeline.is_celebrity(instance.author):
+            feed_cache.invalidate_followers(instance.author)
 
     @action(detail=False, methods=['GET'])
     def list_posts(self, request):
         """
-        List all posts with a count of their likes.
+        List all posts with their denormalized like counts.
         """
-        queryset = self.get_queryset().order_by('-created_at')
+        serializer = PostRowSerializer(context={'request': request})
+        queryset = serializer.prepare(self.get_queryset().order_by('-created_at'))
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = PostListSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        serializer = PostListSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
 
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -68,11 +92,30 @@ class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        """
+        List comments through the compiled read-only serializer.
+        """
+        serializer = CommentRowSerializer(context=self.get_serializer_context())
+        queryset = serializer.prepare(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
     def perform_create(self, serializer):
         """
         Set the author of the comment to the current authenticated user.
         """
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            counters.adjust(Post, comment.post_id, comment_count=1)
+        notify(comment.post.author_id, self.request.user, 'comment', comment.post)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            counters.adjust(Post, instance.post_id, comment_count=-1)
 
 
 class UserFeedView(viewsets.ReadOnlyModelViewSet):
@@ -81,15 +124,51 @@ class UserFeedView(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = PostPagination
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
         """
-        Get posts from followed users, ordered by creation date.
+        Get posts from followed users. Reads come from the materialized
+        timeline, with posts from high-follower authors merged in on read.
+        """
+        return timeline.get_feed_queryset(self.request.user)
+
+    def get_page_data(self, request):
+        """
+        Page through the timeline index with the cursor, then load the page's posts by id.
         """
-        user = self.request.user
-        following_users = user.following.all()
-        return Post.objects.filter(author__in=following_users).order_by('-created_at')
+        paginator = self.paginator
+        paginator.read_request(request)
+        post_ids = timeline.get_feed_page_ids(request.user, paginator.cursor, paginator.page_size + 1)
+        serializer = PostRowSerializer(context=self.get_serializer_context())
+        rows = {row['id']: row for row in serializer.prepare(Post.objects.filter(pk__in=post_ids))}
+        page = paginator.set_page([rows[pk] for pk in post_ids if pk in rows])
+        return paginator.get_paginated_data(serializer.serialize(page))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve feed pages from the per-user cache. Clients that send back the
+        ETag of a page that is still current get a 304 without a feed query.
+        """
+        key = feed_cache.page_key(
+            request.user.pk,
+            cursor=request.query_params.get('cursor'),
+            page_size=request.query_params.get('page_size'),
+        )
+        etag = feed_cache.etag_for(key)
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = feed_cache.get_page(key)
+            if data is None:
+                data = self.get_page_data(request)
+                feed_cache.set_page(key, data)
+            response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 @api_view(['POST'])
@@ -97,13 +176,21 @@ class UserFeedView(viewsets.ReadOnlyModelViewSet):
 def like_post(request, pk):
     """
     Allow a user to like a post.
+    With the like buffer enabled the like is acknowledged immediately
+    and written to the database on the next flush.
     """
+    if like_buffer.is_enabled():
+        return _buffer_like(request, pk, liked=True)
+
     post = get_object_or_404(Post, pk=pk)
     user = request.user
 
     with transaction.atomic():
         like, created = Like.objects.get_or_create(user=user, post=post)
         if created:
+            counters.adjust(Post, post.pk, like_count=1)
+            feed_cache.invalidate([user.pk])
+            notify(post.author_id, user, 'like', post)
             return Response(
                 {"detail": "Post liked successfully."},
                 status=status.HTTP_201_CREATED,
@@ -120,12 +207,17 @@ def unlike_post(request, pk):
     """
     Allow a user to unlike a post.
     """
+    if like_buffer.is_enabled():
+        return _buffer_like(request, pk, liked=False)
+
     post = get_object_or_404(Post, pk=pk)
     user = request.user
 
     with transaction.atomic():
         deleted, _ = Like.objects.filter(post=post, user=user).delete()
         if deleted:
+            counters.adjust(Post, post.pk, like_count=-1)
+            feed_cache.invalidate([user.pk])
             return Response(
                 {"detail": "Post unliked successfully."},
                 status=status.HTTP_200_OK,
@@ -134,3 +226,123 @@ def unlike_post(request, pk):
             {"detail": "You have not liked this post."},
             status=status.HTTP_400_BAD_REQUEST,
         )
+
+
+def _buffer_like(request, pk, liked):
+    """
+    Queue a like or unlike in the write-behind buffer and acknowledge it.
+    """
+    if not Post.objects.filter(pk=pk).exists():
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    like_buffer.like_buffer.add(request.user.pk, pk, liked)
+    return Response(
+        {"detail": "Like accepted." if liked else "Unlike accepted."},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+# Async read path (ASGI)
+# Plain async Django views over the async ORM. Under an ASGI server they do
+# not occupy a worker thread while waiting on the database. Django runs async
+# ORM calls one at a time on a single thread, so a request's queries are
+# awaited in turn.
+
+def _unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+async def _liked_post_ids(user, post_ids):
+    return {
+        pk async for pk in
+        Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+    }
+
+
+async def _fetch(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _paginated_posts(request, user, queryset):
+    """
+    Fetch a cursor page of posts, then the user's likes on it.
+    """
+    paginator = PostCursorPagination()
+    serializer = PostRowSerializer()
+    page = paginator.set_page(await _fetch(paginator.get_page_queryset(serializer.prepare(queryset), request)))
+    # Look the likes up by the fetched ids: a subquery would run the page
+    # query again, and MySQL rejects LIMIT inside IN (...).
+    serializer.context['liked_post_ids'] = await _liked_post_ids(user, [row['id'] for row in page])
+    return paginator.get_paginated_data(serializer.serialize(page))
+
+
+async def _feed_page(request, user):
+    """
+    Async variant of UserFeedView.get_page_data.
+    """
+    paginator = PostCursorPagination()
+    paginator.read_request(request)
+    post_ids = await timeline.aget_feed_page_ids(user, paginator.cursor, paginator.page_size + 1)
+    serializer = PostRowSerializer()
+    rows = {row['id']: row for row in await _fetch(serializer.prepare(Post.objects.filter(pk__in=post_ids)))}
+    page = paginator.set_page([rows[pk] for pk in post_ids if pk in rows])
+    serializer.context['liked_post_ids'] = await _liked_post_ids(user, post_ids)
+    return paginator.get_paginated_data(serializer.serialize(page))
+
+
+async def async_feed(request):
+    """
+    Async variant of UserFeedView.list, sharing its page cache and ETags.
+    """
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+
+    key = await sync_to_async(feed_cache.page_key)(
+        user.pk,
+        cursor=request.GET.get('cursor'),
+        page_size=request.GET.get('page_size'),
+    )
+    etag = feed_cache.etag_for(key)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        data = await sync_to_async(feed_cache.get_page)(key)
+        if data is None:
+            try:
+                data = await _feed_page(request, user)
+            except NotFound as exc:
+                return JsonResponse({"detail": str(exc.detail)}, status=404)
+            await sync_to_async(feed_cache.set_page)(key, data)
+        response = JsonResponse(data)
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+async def async_list_posts(request):
+    """
+    Async variant of PostViewSet.list_posts.
+    """
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+    try:
+        data = await _paginated_posts(request, user, Post.objects.all())
+    except NotFound as exc:
+        return JsonResponse({"detail": str(exc.detail)}, status=404)
+    return JsonResponse(data)
+
+
+async def async_post_detail(request, pk):
+    """
+    Async variant of PostViewSet.retrieve.
+    """
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+
+    post = await Post.objects.filter(pk=pk).afirst()
+    if post is None:
+        return JsonResponse({"detail": "Not found."}, status=404)
+    return JsonResponse(PostSerializer(post).data)
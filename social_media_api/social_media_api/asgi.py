@@ -3,6 +3,10 @@ ASGI config for social_media_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project with an ASGI server (for example ``uvicorn
+social_media_api.asgi:application``) so the notification stream and
+long-poll endpoints hold idle connections without tying up a thread each.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -130,11 +130,96 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST_FRAMEWORK
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Login attempts per client IP and per username (see accounts.throttling)
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '60/min',
+        'login_username': '10/min',
+    },
 }
 
 # Custom user model
-AUTH_USER_MODEL = 'accounts.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'accounts.User'
+
+# Home timeline
+# Authors with at least this many followers are not fanned out on write;
+# their posts are merged into followers' feeds at read time instead.
+FEED_CELEBRITY_FOLLOWER_THRESHOLD = 10000
+# Number of recent posts copied into a timeline when a user follows someone.
+FEED_BACKFILL_LIMIT = 200
+# Timelines keep this many of their newest entries; older posts drop out of
+# the feed. Run ``manage.py trim_timelines`` periodically to enforce it.
+FEED_TIMELINE_MAX_LENGTH = 1000
+
+# Write-behind like buffer
+# When enabled, like/unlike requests are acknowledged with 202 and written in
+# batches every LIKE_BUFFER_FLUSH_INTERVAL seconds by a background thread.
+LIKE_BUFFER_ENABLED = False
+LIKE_BUFFER_FLUSH_INTERVAL = 0.5
+
+# Feed page cache
+# Serialized feed pages are cached per user for this many seconds and dropped
+# early when the user's feed changes (see posts.feed_cache).
+FEED_CACHE_TIMEOUT = 60
+
+# Follow graph
+# Per-user following/follower id lists are cached for this many seconds (see
+# accounts.follow_graph) and dropped by the follow endpoints. They only serve
+# display reads; with a per-process cache, other processes see a follow once
+# their copy expires.
+FOLLOW_GRAPH_CACHE_TIMEOUT = 300
+
+# Token authentication cache (see accounts.authentication)
+# Authenticated tokens are kept in a per-process LRU and in the default cache.
+TOKEN_AUTH_CACHE_TIMEOUT = 300
+TOKEN_AUTH_LOCAL_CACHE_TIMEOUT = 10
+TOKEN_AUTH_LOCAL_CACHE_SIZE = 1024
+
+# Login
+# Outdated password hashes (after a change to PASSWORD_HASHERS or a new work
+# factor) are upgraded by a background thread instead of during the login
+# request (see accounts.passwords). Set it to False to upgrade them inline.
+PASSWORD_REHASH_DEFERRED = True
+# Password checks run on LOGIN_HASH_WORKERS threads; logins beyond
+# LOGIN_HASH_MAX_PENDING concurrent checks get a 503 instead of queueing.
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_MAX_PENDING = 32
+# Where login rate-limit windows are kept. Use
+# 'accounts.throttling.SharedCacheHistory' with a shared cache to enforce the
+# limits across processes.
+LOGIN_THROTTLE_BACKEND = 'accounts.throttling.InMemoryHistory'
+
+# "Who to follow" suggestions, rebuilt by the compute_suggestions command.
+# Candidates are scored by mutual follows plus SUGGESTIONS_ACTIVITY_WEIGHT times
+# log(1 + posts in the last SUGGESTIONS_ACTIVITY_DAYS days).
+SUGGESTIONS_TOP_K = 20
+SUGGESTIONS_ACTIVITY_DAYS = 7
+SUGGESTIONS_ACTIVITY_WEIGHT = 0.5
+
+# Notifications
+# Events are queued in memory, coalesced and written with bulk_create by a
+# background thread pool every NOTIFICATIONS_FLUSH_INTERVAL seconds. Set
+# NOTIFICATIONS_ASYNC to False to write them synchronously; the test runner
+# below does so for the whole suite.
+NOTIFICATIONS_ASYNC = True
+NOTIFICATIONS_FLUSH_INTERVAL = 1.0
+NOTIFICATIONS_WORKERS = 2
+# Pub/sub backend used to push new notifications to streaming clients.
+NOTIFICATIONS_BROKER = 'notifications.broker.InProcessBroker'
+# Seconds between keep-alive comments on the server-sent events stream.
+NOTIFICATIONS_STREAM_HEARTBEAT = 15
+# Longest time a long-poll request waits for a notification.
+NOTIFICATIONS_POLL_TIMEOUT = 30
+# Unread counters are re-seeded from the database after this many seconds.
+# Increments from other processes are only seen through a shared cache (Redis
+# or Memcached in CACHES); with the default per-process cache, counters can
+# lag for up to this long.
+NOTIFICATIONS_UNREAD_CACHE_TIMEOUT = 300
+
+# Test runner
+# Writes notifications synchronously while the suite runs (see
+# social_media_api.test_runner).
+TEST_RUNNER = 'social_media_api.test_runner.TestRunner'
@@ -0,0 +1,20 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the suite with notifications written on the request thread, so no
+    collector or writer threads outlive a test and touch the database after
+    its transaction (or the test database itself) is gone. Tests of the
+    background path turn NOTIFICATIONS_ASYNC back on with override_settings.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(NOTIFICATIONS_ASYNC=False)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)